@@ -10,6 +10,13 @@ from typing import List, Optional, Any, Dict
 from openai import OpenAI
 import textwrap
 import ast
+import sys
+
+# Shared helpers live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from prompt_budget import PromptTemplate, Section
+from tool_index import ToolIndex, TOOL_DIRECTORIES, defines_tool_class
+from run_journal import RunJournal
 
 # Load environment variables
 load_dotenv()
@@ -51,12 +58,40 @@ class Calculator(Tool[float]):
             raise ToolHardError(f"Failed to evaluate expression: {str(e)}")
 '''
 
+# Prompt templates are compiled once and trimmed to the model's token budget on render
+TOOL_BODY_TEMPLATE = PromptTemplate("""Write a simple Python function that {task_description}.
+The function should:
+1. Take parameters: {input_params}
+2. Return a {output_type}
+3. Be simple and focused
+
+{example}
+Return ONLY the function body.""")
+
+TOOL_BODY_EXAMPLE = """Example format:
+```python
+# Your code here
+return "your result"
+```
+"""
+
+TOOL_CLASS_TEMPLATE = PromptTemplate("""Create a complete Python class that implements a tool named {tool_name}.
+The class should:
+1. Have an __init__ method that sets name and description.
+2. Have a run method that takes parameters: {params_string}.
+3. Return type should be {output_type}.
+4. Implement the functionality described in: {task_description}.
+
+{example}
+Return ONLY the complete class code exactly as shown in the example, with proper indentation.""")
+
 class ToolGenerationParams(BaseModel):
     """Parameters for generating a new tool."""
     tool_name: str = Field(..., description="Name of the tool to create")
     task_description: str = Field(..., description="Detailed description of what the tool should do")
     input_params: List[str] = Field(default=[], description="List of input parameters the tool needs")
     output_type: str = Field(default="str", description="Expected return type of the tool")
+    allow_similar: bool = Field(default=False, description="Generate the tool even if a similar one already exists")
 
 class DynamicToolGenerator(Tool[str]):
     """Creates tools dynamically using Portia's planning system."""
@@ -67,9 +102,20 @@ class DynamicToolGenerator(Tool[str]):
     args_schema: type[ToolGenerationParams] = ToolGenerationParams
     output_schema: tuple[str, str] = ("str", "Result of tool creation")
 
-    def run(self, ctx: ToolRunContext, tool_name: str, task_description: str, input_params: List[str], output_type: str) -> str:
+    def run(self, ctx: ToolRunContext, tool_name: str, task_description: str, input_params: List[str], output_type: str, allow_similar: bool = False) -> str:
         """Create a tool with the given parameters."""
         try:
+            # Offer a similar existing tool before paying for a new one; the caller decides
+            match = None if allow_similar else tool_index.best_match(
+                f"{tool_name} {task_description} {' '.join(input_params)} {output_type}", params=input_params
+            )
+            if match and defines_tool_class(match[1]):
+                score, match_path, match_entry = match
+                return (
+                    f"A similar tool already exists ({score:.0%} match): {match_path} - {match_entry['summary']}. "
+                    "If it does what is needed, use it; otherwise call create_tool again with allow_similar=true."
+                )
+
             # Create a sub-portia instance to generate the tool code
             sub_config = Config.from_default(
                 llm_provider="openai",
@@ -78,28 +124,31 @@ class DynamicToolGenerator(Tool[str]):
             sub_portia = Portia(config=sub_config)
 
             # Ask LLM to generate the tool's run method
-            tool_query = f"""Write a simple Python function that {task_description}.
-The function should:
-1. Take parameters: {', '.join(input_params)}
-2. Return a {output_type}
-3. Be simple and focused
-
-Example format:
-```python
-# Your code here
-return "your result"
-```
+            tool_query = TOOL_BODY_TEMPLATE.render(
+                model=LLMModel.GPT_3_5_TURBO,
+                task_description=Section(task_description, priority=1),
+                input_params=', '.join(input_params),
+                output_type=output_type,
+                example=Section(TOOL_BODY_EXAMPLE, kind="example", priority=0),
+            )
 
-Return ONLY the function body."""
+            def generate_body():
+                result = sub_portia.run(tool_query)
+                if not result.state == "COMPLETE" or not result.outputs.final_output:
+                    return None
+                return result.outputs.final_output.value.strip()
 
-            result = sub_portia.run(tool_query)
-            if not result.state == "COMPLETE" or not result.outputs.final_output:
+            # Inside a batch, generated bodies are journaled so a resumed batch does not pay for them twice
+            if journal is None:
+                generated_code = generate_body()
+            else:
+                generated_code = journal.run_stage(f"generate:{tool_name}", tool_query, generate_body)
+            if generated_code is None:
                 # Use default implementation if LLM fails
                 generated_code = "# Default implementation\n"
                 generated_code += f"return f\"Generated response for {', '.join(input_params)}\""
             else:
                 # Extract the generated code
-                generated_code = result.outputs.final_output.value.strip()
                 if "```" in generated_code:
                     # Extract code from markdown code block if present
                     start = generated_code.find("```") + 3
@@ -135,6 +184,7 @@ class {tool_name}(Tool[{output_type}]):
             tool_file = f"{tool_name.lower()}_tool.py"
             with open(tool_file, 'w') as f:
                 f.write(tool_code)
+            tool_index.add(tool_file)
             
             return f"Successfully created {tool_file}"
         except Exception as e:
@@ -180,6 +230,42 @@ class CodeComplexityAnalyzer:
         comment_lines = sum(1 for line in lines if line.strip().startswith("#"))
         return comment_lines / len(lines) if lines else 0.0
 
+# Journal of the running batch of generations, see start_batch()
+journal: Optional[RunJournal] = None
+
+def start_batch(name: str = "dynamictools", resume: Optional[bool] = None) -> RunJournal:
+    """
+    Starts journaling a batch of tool generations.
+
+    Args:
+        name (str): Session name of the batch; its journal is runs/<name>.jsonl.
+        resume (bool): Reuse the generations of an interrupted batch with the same name.
+            If None, asks when there is one to resume.
+
+    Returns:
+        RunJournal: The batch's journal.
+    """
+    global journal
+    journal = RunJournal.for_session(name)
+    if resume is None:
+        resume = journal.resumable() and input(
+            f"Resume the interrupted batch {name} (last completed stage: {journal.last_stage()})? (y/n): "
+        ).strip().lower() == "y"
+    if not resume:
+        journal.start(batch=name)
+    return journal
+
+def finish_batch(**metadata) -> None:
+    """Marks the batch as done, so its generations are not reused by the next one."""
+    global journal
+    if journal is not None:
+        journal.finish(**metadata)
+        journal = None
+
+# Index of tools already on disk, checked before generating a new one
+tool_index = ToolIndex.load()
+tool_index.update(TOOL_DIRECTORIES)
+
 # Initialize Portia with tool generator
 config = Config.from_default(
     llm_provider="openai",
@@ -251,18 +337,23 @@ Return ONLY the if-else block."""
 def generate_tool_code(tool_name: str, task_description: str, input_params: List[str], output_type: str) -> str:
     """Generate tool code using OpenAI."""
     try:
+        # Offer a similar existing tool class instead of generating it again
+        match = tool_index.best_match(
+            f"{tool_name} {task_description} {' '.join(input_params)} {output_type}", params=input_params
+        )
+        if match and defines_tool_class(match[1]):
+            score, match_path, match_entry = match
+            print(f"An existing tool looks similar ({score:.0%} match): {match_path}")
+            print(f"   {match_entry['summary']}")
+            if input("Reuse it instead of generating a new one? (y/n): ").strip().lower() == "y":
+                with open(match_path, 'r') as f:
+                    return f.read()
+
         # Create a formatted string for the input parameters
         params_string = ', '.join(f'{param}: str' for param in input_params)
 
         # Prompt to generate the tool logic
-        prompt = f"""Create a complete Python class that implements a tool named {tool_name}.
-The class should:
-1. Have an __init__ method that sets name and description.
-2. Have a run method that takes parameters: {params_string}.
-3. Return type should be {output_type}.
-4. Implement the functionality described in: {task_description}.
-
-Example of the exact format to follow:
+        example = f"""Example of the exact format to follow:
 ```python
 class ExampleTool:
     def __init__(self):
@@ -272,8 +363,15 @@ class ExampleTool:
     def run(self, {params_string}) -> str:
         return f"Processed {', '.join(input_params)}"
 ```
-
-Return ONLY the complete class code exactly as shown in the example, with proper indentation."""
+"""
+        prompt = TOOL_CLASS_TEMPLATE.render(
+            model="gpt-3.5-turbo",
+            tool_name=tool_name,
+            params_string=params_string,
+            output_type=output_type,
+            task_description=Section(task_description, priority=1),
+            example=Section(example, kind="example", priority=0),
+        )
 
         response = client.chat.completions.create(
             model="gpt-3.5-turbo",
@@ -286,4 +384,24 @@ Return ONLY the complete class code exactly as shown in the example, with proper
         generated_code = response.choices[0].message.content.strip()
 
         # Extract code from markdown if present
-        if "```
\ No newline at end of file
+        if "```" in generated_code:
+            start = generated_code.find("```") + 3
+            end = generated_code.rfind("```")
+            if "python" in generated_code[start:start+10]:
+                start = generated_code.find("\n", start) + 1
+            generated_code = generated_code[start:end].strip()
+
+        return generated_code
+
+    except Exception as e:
+        print(f"Failed to generate tool code: {str(e)}")
+        return None
+
+if __name__ == "__main__":
+    # Each run is one batch; an interrupted batch can be resumed instead of generating its tools again
+    start_batch(resume=True if "--resume" in sys.argv else None)
+    request = " ".join(arg for arg in sys.argv[1:] if arg != "--resume") or input("Which tools should be created?\n")
+    plan_run = portia.run(request)
+    print(plan_run.outputs.final_output)
+    if plan_run.state == "COMPLETE":
+        finish_batch()
@@ -0,0 +1,741 @@
+"""
+Rule-based performance linter for generated tool code.
+
+Detects common slowdowns in generated code without calling an LLM and, where
+the rewrite cannot change behaviour, fixes them in the source text:
+
+- regex-in-function: patterns compiled (or re.* called with a literal pattern)
+  on every call are hoisted to a module-level compiled pattern.
+- requests-timeout: requests calls without a timeout get one.
+- requests-session: requests calls that open a new connection each time (reported).
+- find-all-slice: soup.find_all(...)[:n] (on a parsed document or a tag found
+  in one) becomes soup.find_all(..., limit=n).
+- find-all-root: find_all over the whole parsed document (reported).
+- string-concat-loop: strings built with += inside a loop (reported).
+- list-membership-loop: `in` checks against a list that grows in the loop (reported).
+- repeated-str-method: the same param.lower()/.upper()/.strip()/.casefold()
+  computed several times is computed once.
+
+Rewrites edit the original text at AST positions, so comments and
+formatting are kept. Code that does not parse is returned unchanged.
+
+Usage:
+    python perf_lint.py [--fix] files...
+"""
+import ast
+import io
+import re
+import sys
+import tokenize
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_TIMEOUT = 10  # seconds, added to requests calls without one
+REQUESTS_METHODS = {"get", "post", "put", "patch", "delete", "head", "options", "request"}
+REGEX_FUNCTIONS = {"search": 2, "match": 2, "fullmatch": 2, "findall": 2, "finditer": 2, "split": 2, "sub": 3, "subn": 3}
+PURE_STR_METHODS = {"lower", "upper", "strip", "casefold"}
+LOOPS = (ast.For, ast.AsyncFor, ast.While)
+FUNCTIONS = (ast.FunctionDef, ast.AsyncFunctionDef)
+# BeautifulSoup methods that return a single tag, and those that return several
+SOUP_TAG_METHODS = {"find", "select_one", "find_parent", "find_next", "find_previous", "find_next_sibling", "find_previous_sibling"}
+SOUP_LIST_METHODS = {"find_all", "select", "find_parents", "find_all_next", "find_all_previous", "find_next_siblings", "find_previous_siblings"}
+
+
+@dataclass
+class Finding:
+    """A performance issue found in the code."""
+    rule: str
+    line: int
+    message: str
+    fixed: bool = False
+
+    def __str__(self) -> str:
+        status = "fixed" if self.fixed else "warning"
+        return f"line {self.line}: [{self.rule}] {self.message} ({status})"
+
+
+# An edit replaces source[start:end] with text, where start and end are character offsets
+Edit = Tuple[int, int, str]
+
+
+class _Source:
+    """Maps AST positions (lines and UTF-8 byte columns) to character offsets."""
+
+    def __init__(self, code: str):
+        self.code = code
+        self.newline = "\r\n" if "\r\n" in code else "\n"
+        self.line_starts = [0]
+        for line in code.splitlines(keepends=True):
+            self.line_starts.append(self.line_starts[-1] + len(line))
+        self.lines = code.splitlines(keepends=True)
+
+    def offset(self, lineno: int, col: int) -> int:
+        line = self.lines[lineno - 1] if lineno - 1 < len(self.lines) else ""
+        return self.line_starts[lineno - 1] + len(line.encode("utf-8")[:col].decode("utf-8", errors="ignore"))
+
+    def span(self, node: ast.AST) -> Tuple[int, int]:
+        return self.offset(node.lineno, node.col_offset), self.offset(node.end_lineno, node.end_col_offset)
+
+    def segment(self, node: ast.AST) -> str:
+        start, end = self.span(node)
+        return self.code[start:end]
+
+    def line_start(self, lineno: int) -> int:
+        return self.line_starts[min(lineno, len(self.line_starts)) - 1]
+
+
+def _apply(code: str, edits: List[Edit]) -> str:
+    for start, end, text in sorted(edits, key=lambda edit: (edit[0], edit[1]), reverse=True):
+        code = code[:start] + text + code[end:]
+    return code
+
+
+def _line_mapper(code: str, edits: List[Edit]) -> Callable[[int], int]:
+    """Maps line numbers of the edited code back to the code before the edits."""
+    changes = []  # (first line of the edit before and after editing, lines it spans after, lines it adds)
+    added = 0
+    for start, end, text in sorted(edits, key=lambda edit: (edit[0], edit[1])):
+        old_line = code.count("\n", 0, start) + 1
+        changes.append((old_line, old_line + added, text.count("\n"), text.count("\n") - code.count("\n", start, end)))
+        added += changes[-1][3]
+
+    def original_line(line: int) -> int:
+        shift = 0
+        for old_line, new_line, spanned, delta in changes:
+            if line < new_line:
+                break
+            if line <= new_line + spanned:
+                # Inside replaced text: clamp to the lines it replaced
+                return old_line + min(line - new_line, spanned - delta)
+            shift += delta
+        return line - shift
+
+    return original_line
+
+
+def _add_argument(source: "_Source", call: ast.Call, argument: str) -> Edit:
+    """Inserts an argument after the call's last argument, before any trailing comment."""
+    start, end = source.span(call)
+    text = source.code[start:end]
+    line_starts = [0]
+    for line in text.splitlines(keepends=True):
+        line_starts.append(line_starts[-1] + len(line))
+    # The last token before the closing parenthesis, skipping comments and line breaks
+    last = None
+    skipped = (tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE, tokenize.ENDMARKER)
+    for token in tokenize.generate_tokens(io.StringIO(text).readline):
+        if token.type in skipped:
+            continue
+        if token.type == tokenize.OP and token.string == ")" and line_starts[token.start[0] - 1] + token.start[1] == len(text) - 1:
+            break
+        last = token
+    insert_at = start + line_starts[last.end[0] - 1] + last.end[1]
+    separator = "" if last.string in ("(", ",") else ", "
+    if last.string == ",":
+        separator = " "
+    return insert_at, insert_at, f"{separator}{argument}"
+
+
+def _parents(tree: ast.AST) -> Dict[ast.AST, ast.AST]:
+    parents = {}
+    for node in ast.walk(tree):
+        for child in ast.iter_child_nodes(node):
+            parents[child] = node
+    return parents
+
+
+def _enclosing(node: ast.AST, parents: Dict[ast.AST, ast.AST], types) -> Optional[ast.AST]:
+    """Returns the closest ancestor of the given types within the same function."""
+    node = parents.get(node)
+    while node is not None and not isinstance(node, FUNCTIONS + (ast.Lambda,)):
+        if isinstance(node, types):
+            return node
+        node = parents.get(node)
+    return None
+
+
+def _enclosing_functions(node: ast.AST, parents: Dict[ast.AST, ast.AST]) -> List[ast.AST]:
+    """Returns the functions (and lambdas) around a node, innermost first."""
+    scopes = []
+    node = parents.get(node)
+    while node is not None:
+        if isinstance(node, FUNCTIONS + (ast.Lambda,)):
+            scopes.append(node)
+        node = parents.get(node)
+    return scopes
+
+
+def _in_function(node: ast.AST, parents: Dict[ast.AST, ast.AST]) -> bool:
+    node = parents.get(node)
+    while node is not None:
+        if isinstance(node, FUNCTIONS + (ast.Lambda,)):
+            return True
+        node = parents.get(node)
+    return False
+
+
+def _is_module_attr(node: ast.AST, module: str, attrs) -> bool:
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id == module
+        and node.func.attr in attrs
+    )
+
+
+def _imports_module(tree: ast.Module, module: str) -> bool:
+    return any(
+        isinstance(node, ast.Import) and any(alias.name == module and alias.asname is None for alias in node.names)
+        for node in tree.body
+    )
+
+
+def _used_names(tree: ast.AST) -> set:
+    return {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)} | {
+        node.name for node in ast.walk(tree) if isinstance(node, FUNCTIONS + (ast.ClassDef,))
+    }
+
+
+def _unique_name(base: str, used: set) -> str:
+    name, suffix = base, 2
+    while name in used:
+        name, suffix = f"{base}_{suffix}", suffix + 1
+    used.add(name)
+    return name
+
+
+def _is_static_pattern(args: List[ast.AST]) -> bool:
+    """A literal pattern, optionally followed by flags such as re.IGNORECASE | re.MULTILINE."""
+    if not (isinstance(args[0], ast.Constant) and isinstance(args[0].value, (str, bytes))):
+        return False
+    for arg in args[1:]:
+        for node in ast.walk(arg):
+            if isinstance(node, ast.Name) and node.id != "re":
+                return False
+            if isinstance(node, ast.Call):
+                return False
+    return True
+
+
+def _compiles(pattern_args: List[ast.AST]) -> bool:
+    """True if the literal pattern compiles, so hoisting it cannot make the module fail to import."""
+    expression = ast.Expression(ast.Call(ast.Name("compile", ast.Load()), list(pattern_args), []))
+    try:
+        code = compile(ast.fix_missing_locations(expression), "<pattern>", "eval")
+        eval(code, {"__builtins__": {}, "compile": re.compile, "re": re})
+    except Exception:
+        return False
+    return True
+
+
+def _binds_re(function: ast.AST) -> bool:
+    """True if the function gives the name re a meaning other than the module."""
+    for node in ast.walk(function):
+        if isinstance(node, ast.Name) and node.id == "re" and not isinstance(node.ctx, ast.Load):
+            return True
+        if isinstance(node, ast.arg) and node.arg == "re":
+            return True
+        if isinstance(node, ast.ImportFrom) and any((alias.asname or alias.name) == "re" for alias in node.names):
+            return True
+        if isinstance(node, ast.Import) and any(alias.asname == "re" and alias.name != "re" for alias in node.names):
+            return True
+        if isinstance(node, (ast.Global, ast.Nonlocal)) and "re" in node.names:
+            return True
+    return False
+
+
+def _regex_in_function(tree, source, parents, fix) -> Tuple[List[Finding], List[Edit]]:
+    findings, edits, definitions = [], [], []
+    if not _imports_module(tree, "re"):
+        return findings, edits
+    used = _used_names(tree)
+
+    for node in ast.walk(tree):
+        if not _in_function(node, parents):
+            continue
+        if _is_module_attr(node, "re", {"compile"}):
+            pattern_args = node.args
+            call_args = None
+        elif _is_module_attr(node, "re", REGEX_FUNCTIONS) and len(node.args) == REGEX_FUNCTIONS[node.func.attr]:
+            pattern_args = node.args[:1]
+            call_args = node.args[1:]
+        else:
+            continue
+        if node.keywords or not pattern_args or not _is_static_pattern(pattern_args):
+            continue
+        scopes = _enclosing_functions(node, parents)
+        if any(_binds_re(scope) for scope in scopes):
+            continue
+        if not _compiles(pattern_args):
+            # Compiling at import would move the error from this call to every import
+            continue
+
+        finding = Finding(
+            "regex-in-function",
+            node.lineno,
+            f"re.{node.func.attr} with a literal pattern recompiles or looks up the pattern on every call; "
+            "compile it once at module level",
+        )
+        findings.append(finding)
+        if not fix:
+            continue
+
+        parent = parents.get(node)
+        if (
+            call_args is None
+            and isinstance(parent, ast.Assign)
+            and len(parent.targets) == 1
+            and isinstance(parent.targets[0], ast.Name)
+        ):
+            base = parent.targets[0].id.upper()
+            if not base.endswith("PATTERN"):
+                base += "_PATTERN"
+        else:
+            base = "_PATTERN"
+        name = _unique_name(base, used)
+        pattern = ", ".join(source.segment(arg) for arg in pattern_args)
+        definitions.append(f"{name} = re.compile({pattern})")
+        if call_args is None:
+            replacement = name
+        else:
+            replacement = f"{name}.{node.func.attr}({', '.join(source.segment(arg) for arg in call_args)})"
+        start, end = source.span(node)
+        edits.append((start, end, replacement))
+        finding.fixed = True
+
+    if definitions:
+        last_import = max(
+            (node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))),
+            key=lambda node: node.end_lineno,
+        )
+        insert_at = source.line_start(last_import.end_lineno + 1)
+        text = source.newline.join(definitions) + source.newline
+        if insert_at == len(source.code) and not source.code.endswith(("\n", "\r")):
+            text = source.newline + text
+        edits.append((insert_at, insert_at, source.newline + text))
+    return findings, edits
+
+
+def _requests(tree, source, parents, fix) -> Tuple[List[Finding], List[Edit]]:
+    findings, edits = [], []
+    calls = [node for node in ast.walk(tree) if _is_module_attr(node, "requests", REQUESTS_METHODS)]
+    for node in calls:
+        keywords = {keyword.arg for keyword in node.keywords}
+        if "timeout" not in keywords and None not in keywords:
+            finding = Finding(
+                "requests-timeout",
+                node.lineno,
+                f"requests.{node.func.attr} without a timeout can hang forever; give it timeout={DEFAULT_TIMEOUT}",
+            )
+            findings.append(finding)
+            if fix:
+                edits.append(_add_argument(source, node, f"timeout={DEFAULT_TIMEOUT}"))
+                finding.fixed = True
+        if _in_function(node, parents) or _enclosing(node, parents, LOOPS):
+            findings.append(Finding(
+                "requests-session",
+                node.lineno,
+                f"requests.{node.func.attr} opens a new connection for every call; "
+                "reuse a requests.Session() created once",
+            ))
+    return findings, edits
+
+
+def _soup_roots(tree) -> set:
+    roots = set()
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Assign)
+            and isinstance(node.value, ast.Call)
+            and getattr(node.value.func, "id", getattr(node.value.func, "attr", None)) == "BeautifulSoup"
+        ):
+            roots.update(target.id for target in node.targets if isinstance(target, ast.Name))
+    return roots
+
+
+def _is_soup(node: ast.AST, names: set) -> bool:
+    """True for a parsed document or tag: a known name, soup.find(...), or soup.div."""
+    if isinstance(node, ast.Name):
+        return node.id in names
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr in SOUP_TAG_METHODS:
+        return _is_soup(node.func.value, names)
+    if isinstance(node, ast.Attribute):
+        return _is_soup(node.value, names)
+    return False
+
+
+def _soup_names(tree, roots: set) -> set:
+    """Names bound to a parsed document, or to tags found in one."""
+    names = set(roots)
+    changed = True
+    while changed:
+        changed = False
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Assign) and _is_soup(node.value, names):
+                targets = node.targets
+            elif (
+                isinstance(node, (ast.For, ast.comprehension))
+                and isinstance(node.iter, ast.Call)
+                and isinstance(node.iter.func, ast.Attribute)
+                and node.iter.func.attr in SOUP_LIST_METHODS
+                and _is_soup(node.iter.func.value, names)
+            ):
+                targets = [node.target]
+            else:
+                continue
+            for target in targets:
+                if isinstance(target, ast.Name) and target.id not in names:
+                    names.add(target.id)
+                    changed = True
+    return names
+
+
+def _find_all(tree, source, parents, fix) -> Tuple[List[Finding], List[Edit]]:
+    findings, edits = [], []
+    roots = _soup_roots(tree)
+    soups = _soup_names(tree, roots)
+    sliced = set()
+
+    for node in ast.walk(tree):
+        if not (
+            isinstance(node, ast.Subscript)
+            and isinstance(node.value, ast.Call)
+            and isinstance(node.value.func, ast.Attribute)
+            and node.value.func.attr == "find_all"
+            and _is_soup(node.value.func.value, soups)
+            and isinstance(node.slice, ast.Slice)
+            and node.slice.lower is None
+            and node.slice.step is None
+            and isinstance(node.slice.upper, ast.Constant)
+            and isinstance(node.slice.upper.value, int)
+            and node.slice.upper.value > 0  # limit=0 means no limit
+        ):
+            continue
+        call = node.value
+        keywords = {keyword.arg for keyword in call.keywords}
+        if "limit" in keywords or None in keywords or len(call.args) >= 4:
+            continue
+        sliced.add(call)
+        limit = node.slice.upper.value
+        finding = Finding(
+            "find-all-slice",
+            node.lineno,
+            f"find_all(...)[:{limit}] collects every match before slicing; pass limit={limit} instead",
+        )
+        findings.append(finding)
+        if fix:
+            edits.append(_add_argument(source, call, f"limit={limit}"))
+            edits.append((source.span(call)[1], source.span(node)[1], ""))
+            finding.fixed = True
+
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Call)
+            and node not in sliced
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr == "find_all"
+            and isinstance(node.func.value, ast.Name)
+            and node.func.value.id in roots
+            and "limit" not in {keyword.arg for keyword in node.keywords}
+        ):
+            findings.append(Finding(
+                "find-all-root",
+                node.lineno,
+                "find_all searches the whole document; narrow it to a container element or pass limit=",
+            ))
+    return findings, edits
+
+
+def _string_concat_loop(tree, source, parents, fix) -> Tuple[List[Finding], List[Edit]]:
+    findings = []
+    for node in ast.walk(tree):
+        if not (
+            isinstance(node, ast.AugAssign)
+            and isinstance(node.op, ast.Add)
+            and isinstance(node.target, ast.Name)
+            and _enclosing(node, parents, LOOPS)
+        ):
+            continue
+        value = node.value
+        is_text = isinstance(value, ast.JoinedStr) or (isinstance(value, ast.Constant) and isinstance(value.value, str))
+        if is_text:
+            findings.append(Finding(
+                "string-concat-loop",
+                node.lineno,
+                f"'{node.target.id} +=' in a loop copies the string every iteration; "
+                "append the parts to a list and ''.join() them",
+            ))
+    return findings, []
+
+
+def _list_membership_loop(tree, source, parents, fix) -> Tuple[List[Finding], List[Edit]]:
+    findings = []
+    for loop in ast.walk(tree):
+        if not isinstance(loop, LOOPS):
+            continue
+        appended = {
+            node.func.value.id
+            for node in ast.walk(loop)
+            if isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr in ("append", "extend", "insert")
+            and isinstance(node.func.value, ast.Name)
+        }
+        for node in ast.walk(loop):
+            if not isinstance(node, ast.Compare):
+                continue
+            for op, comparator in zip(node.ops, node.comparators):
+                if not isinstance(op, (ast.In, ast.NotIn)):
+                    continue
+                if isinstance(comparator, ast.Name) and comparator.id in appended:
+                    message = f"'in {comparator.id}' scans a growing list on every iteration; track seen items in a set"
+                elif isinstance(comparator, (ast.List, ast.ListComp)):
+                    message = "'in [...]' inside a loop scans the list every time; use a set built once"
+                else:
+                    continue
+                findings.append(Finding("list-membership-loop", node.lineno, message))
+    return findings, []
+
+
+# Nodes whose own evaluation has no side effects once their children are evaluated
+_INERT = (ast.Name, ast.Constant, ast.Tuple, ast.List, ast.Set, ast.Dict, ast.keyword)
+_GRAMMAR = (ast.expr_context, ast.operator, ast.boolop, ast.unaryop, ast.cmpop)
+
+
+def _evaluated_first(expression: ast.AST, target: ast.AST) -> Optional[bool]:
+    """
+    True if target is evaluated unconditionally and before anything that could
+    have side effects or raise, False if it is not, None if expression does not
+    contain target and has no side effects.
+    """
+    if expression is target:
+        return True
+    if isinstance(expression, (ast.Name, ast.Constant)):
+        return None
+    conditional = False
+    if isinstance(expression, ast.BoolOp):
+        children, conditional = [expression.values[0]], True
+    elif isinstance(expression, ast.IfExp):
+        children, conditional = [expression.test], True
+    elif isinstance(expression, ast.Compare):
+        children, conditional = [expression.left, expression.comparators[0]], len(expression.comparators) > 1
+    elif isinstance(expression, ast.Dict):
+        children = [child for pair in zip(expression.keys, expression.values) for child in pair if child is not None]
+    elif isinstance(expression, (ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+        return False
+    else:
+        children = [child for child in ast.iter_child_nodes(expression) if not isinstance(child, _GRAMMAR)]
+    for child in children:
+        result = _evaluated_first(child, target)
+        if result is not None:
+            return result
+    if conditional or not isinstance(expression, _INERT):
+        return False
+    return None
+
+
+def _statement_head(statement: ast.stmt) -> Optional[ast.AST]:
+    if isinstance(statement, (ast.If, ast.While)):
+        return statement.test
+    if isinstance(statement, ast.AugAssign) and not isinstance(statement.target, ast.Name):
+        return None  # obj.attr += ... reads the target before the value
+    if isinstance(statement, (ast.Assign, ast.AnnAssign, ast.AugAssign, ast.Expr, ast.Return)):
+        return statement.value
+    if isinstance(statement, (ast.For, ast.AsyncFor)):
+        return statement.iter
+    return None
+
+
+def _repeated_str_method(tree, source, parents, fix) -> Tuple[List[Finding], List[Edit]]:
+    findings, edits = [], []
+    for function in ast.walk(tree):
+        if not isinstance(function, FUNCTIONS):
+            continue
+        arguments = function.args
+        params = {arg.arg for arg in arguments.posonlyargs + arguments.args + arguments.kwonlyargs}
+        rebound = {
+            node.id for node in ast.walk(function)
+            if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load)
+        } | {
+            arg.arg for node in ast.walk(function) if node is not function and isinstance(node, FUNCTIONS + (ast.Lambda,))
+            for arg in node.args.posonlyargs + node.args.args + node.args.kwonlyargs
+        } | {
+            name for node in ast.walk(function) if isinstance(node, (ast.Global, ast.Nonlocal)) for name in node.names
+        }
+
+        calls: Dict[Tuple[str, str], List[ast.Call]] = {}
+        for node in ast.walk(function):
+            if (
+                isinstance(node, ast.Call)
+                and isinstance(node.func, ast.Attribute)
+                and node.func.attr in PURE_STR_METHODS
+                and isinstance(node.func.value, ast.Name)
+                and node.func.value.id in params - rebound
+                and not node.args
+                and not node.keywords
+            ):
+                calls.setdefault((node.func.value.id, node.func.attr), []).append(node)
+
+        used = _used_names(function)
+        for (name, method), nodes in calls.items():
+            if len(nodes) < 2:
+                continue
+            nodes.sort(key=lambda node: (node.lineno, node.col_offset))
+            finding = Finding(
+                "repeated-str-method",
+                nodes[0].lineno,
+                f"{name}.{method}() is computed {len(nodes)} times; compute it once",
+            )
+            findings.append(finding)
+            if not fix:
+                continue
+
+            # Only hoist when the first call is the first thing a top-level statement
+            # evaluates, so evaluation order and exception paths stay the same
+            statement = next(
+                (stmt for stmt in function.body if any(node is nodes[0] for node in ast.walk(stmt))),
+                None,
+            )
+            head = _statement_head(statement) if statement is not None else None
+            if head is None or statement.lineno == function.lineno or not _evaluated_first(head, nodes[0]):
+                continue
+            indent = source.code[source.line_start(statement.lineno):source.offset(statement.lineno, statement.col_offset)]
+            if indent.strip():
+                continue  # the statement shares its line with other code
+
+            variable = _unique_name(f"{name}_{method}", used)
+            insert_at = source.line_start(statement.lineno)
+            edits.append((insert_at, insert_at, f"{indent}{variable} = {name}.{method}(){source.newline}"))
+            for node in nodes:
+                start, end = source.span(node)
+                edits.append((start, end, variable))
+            finding.fixed = True
+    return findings, edits
+
+
+RULES = [
+    _regex_in_function,
+    _requests,
+    _find_all,
+    _string_concat_loop,
+    _list_membership_loop,
+    _repeated_str_method,
+]
+
+
+def _split_fences(code: str) -> Optional[Tuple[str, str, str]]:
+    """Splits code wrapped in a markdown fence into (before, code, after)."""
+    start = code.find("```")
+    if start == -1:
+        return None
+    body_start = code.find("\n", start)
+    if body_start == -1:
+        return None
+    body_start += 1
+    end = code.find("```", body_start)
+    if end == -1:
+        end = len(code)
+    return code[:body_start], code[body_start:end], code[end:]
+
+
+def _parse(code: str) -> Tuple[Optional[ast.Module], str, str, str]:
+    """Parses code, looking inside a markdown fence if the code itself does not parse."""
+    try:
+        return ast.parse(code), "", code, ""
+    except SyntaxError:
+        pass
+    parts = _split_fences(code)
+    if parts is not None:
+        try:
+            return ast.parse(parts[1]), parts[0], parts[1], parts[2]
+        except SyntaxError:
+            pass
+    return None, "", code, ""
+
+
+def _shift(findings: List[Finding], prefix: str) -> List[Finding]:
+    lines = prefix.count("\n")
+    for finding in findings:
+        finding.line += lines
+    return sorted(findings, key=lambda finding: finding.line)
+
+
+def lint(code: str) -> List[Finding]:
+    """
+    Reports performance issues in code without changing it.
+
+    Returns:
+        List[Finding]: The issues found, in line order. Empty if the code does not parse.
+    """
+    tree, prefix, code, _ = _parse(code)
+    if tree is None:
+        return []
+    source = _Source(code)
+    parents = _parents(tree)
+    findings = []
+    for rule in RULES:
+        findings.extend(rule(tree, source, parents, False)[0])
+    return _shift(findings, prefix)
+
+
+def fix(code: str) -> Tuple[str, List[Finding]]:
+    """
+    Rewrites the performance issues that can be fixed safely.
+
+    Rules are applied one at a time and the code is parsed again after each,
+    so their edits never overlap. A rule whose rewrite does not parse is
+    skipped and its findings are reported as not fixed. Code wrapped in a
+    markdown fence is fixed inside the fence. Finding lines refer to the
+    code as it was passed in, like those of lint().
+
+    Args:
+        code (str): Python source of the generated tool.
+
+    Returns:
+        Tuple[str, List[Finding]]: The rewritten code and every issue found.
+    """
+    tree, prefix, code, suffix = _parse(code)
+    if tree is None:
+        return code, []
+
+    findings = []
+    line_maps: List[Callable[[int], int]] = []  # one per applied rule, to undo its line shifts
+    for rule in RULES:
+        source = _Source(code)
+        rule_findings, edits = rule(tree, source, _parents(tree), True)
+        for finding in rule_findings:
+            for original_line in reversed(line_maps):
+                finding.line = original_line(finding.line)
+        if edits:
+            rewritten = _apply(code, edits)
+            try:
+                tree = ast.parse(rewritten)
+                line_maps.append(_line_mapper(code, edits))
+                code = rewritten
+            except SyntaxError:
+                for finding in rule_findings:
+                    finding.fixed = False
+        findings.extend(rule_findings)
+    return prefix + code + suffix, _shift(findings, prefix)
+
+
+def format_findings(findings: List[Finding]) -> str:
+    return "\n".join(str(finding) for finding in findings)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    apply_fixes = "--fix" in args
+    for path in [arg for arg in args if arg != "--fix"]:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            original = f.read()
+        if apply_fixes:
+            fixed_code, findings = fix(original)
+            if fixed_code != original:
+                with open(path, "w", encoding="utf-8", newline="") as f:
+                    f.write(fixed_code)
+        else:
+            findings = lint(original)
+        for finding in findings:
+            print(f"{path}:{finding}")
@@ -0,0 +1,339 @@
+"""
+Prompt assembly with a per-model token budget.
+
+Templates are compiled once when they are created and rendered with named
+sections. If the rendered prompt would not fit the model's budget, the
+lowest-value sections are shrunk first: examples are dropped, docstrings are
+stripped from code and repeated boilerplate is removed from reviews. Only
+then are sections truncated, lowest priority first. A prompt that still does
+not fit raises PromptTooLongError instead of being sent cut short.
+"""
+import ast
+import math
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from string import Formatter
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Context window of each model, in tokens
+MODEL_BUDGETS: Dict[str, int] = {
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-3.5-turbo": 16385,
+}
+DEFAULT_MODEL = "gpt-4"
+COMPLETION_RESERVE = 1500  # tokens left free for the model's answer
+CHARS_PER_TOKEN = 4  # estimate used when tiktoken is not installed
+TRUNCATION_MARKER = "\n... [truncated]"
+MIN_REVIEW_TOKENS = 300  # a review pasted into a revision prompt is never cut below this
+
+# Whole review sentences that add nothing when the review is pasted back into a prompt
+FILLER_SENTENCES = re.compile(
+    r"(i hope (this|these|that) (helps|is helpful|are helpful)"
+    r"|let me know if you (have|need) any (other |further |more )?(questions|help|clarifications?)"
+    r"|feel free to ask if you have any (other |further |more )?questions"
+    r"|here('s| is) my review( of (the|your) code)?"
+    r"|happy coding|good luck)[.!:]?",
+    re.IGNORECASE,
+)
+
+
+class PromptTooLongError(ValueError):
+    """Raised when a prompt does not fit its budget even after shrinking every section it may."""
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # The BPE files could not be loaded (e.g. offline), so estimate instead
+        return None
+
+
+def _model_name(model) -> str:
+    """Accepts plain names as well as enum values such as LLMModel.GPT_4."""
+    if model is None:
+        return DEFAULT_MODEL
+    return str(getattr(model, "value", model))
+
+
+def count_tokens(text: str, model=None) -> int:
+    """
+    Counts the tokens in text locally, without calling any API.
+
+    Uses tiktoken when it is installed and falls back to a character-based
+    estimate otherwise.
+    """
+    if not text:
+        return 0
+    encoding = _encoding(_model_name(model))
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text))
+
+
+def model_budget(model=None, reserve: int = COMPLETION_RESERVE) -> int:
+    """
+    Returns how many prompt tokens may be sent to the given model.
+
+    Unknown names are matched against the longest known prefix, so dated
+    snapshots like "gpt-4-0613" get the budget of "gpt-4".
+    """
+    name = _model_name(model)
+    window = MODEL_BUDGETS.get(name)
+    if window is None:
+        prefixes = [known for known in MODEL_BUDGETS if name.startswith(known)]
+        window = MODEL_BUDGETS[max(prefixes, key=len)] if prefixes else MODEL_BUDGETS[DEFAULT_MODEL]
+    return max(window - reserve, 0)
+
+
+def strip_docstrings(code: str) -> str:
+    """
+    Removes module, class and function docstrings from Python code.
+
+    Code that does not parse (e.g. still wrapped in markdown) is returned unchanged.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return code
+
+    lines = code.splitlines()
+
+    def own_lines(node: ast.AST) -> bool:
+        # Docstrings sharing a line with other code (e.g. `class A: "doc"`) are kept
+        before = lines[node.lineno - 1].encode("utf-8")[:node.col_offset].decode("utf-8", errors="ignore")
+        after = lines[node.end_lineno - 1].encode("utf-8")[node.end_col_offset:].decode("utf-8", errors="ignore")
+        return not before.strip() and (not after.strip() or after.strip().startswith("#"))
+
+    spans = []
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        if not node.body:
+            continue
+        first = node.body[0]
+        if (
+            isinstance(first, ast.Expr)
+            and isinstance(first.value, ast.Constant)
+            and isinstance(first.value.value, str)
+            and own_lines(first)
+        ):
+            # A body that is only a docstring still needs a statement
+            placeholder = len(node.body) == 1
+            spans.append((first.lineno, first.end_lineno, first.col_offset, placeholder))
+
+    for start, end, indent, placeholder in sorted(spans, reverse=True):
+        replacement = [" " * indent + "..."] if placeholder else []
+        lines[start - 1:end] = replacement
+    return "\n".join(lines)
+
+
+def _without_filler(line: str) -> str:
+    sentences = re.split(r"(?<=[.!?])\s+", line.strip())
+    kept = [sentence for sentence in sentences if not FILLER_SENTENCES.fullmatch(sentence)]
+    if len(kept) == len(sentences):
+        return line.rstrip()
+    return line[:len(line) - len(line.lstrip())] + " ".join(kept)
+
+
+def dedupe_boilerplate(text: str) -> str:
+    """
+    Removes repeated prose lines, filler sentences and runs of blank lines from a review.
+
+    Lines inside ``` fences are kept as they are, so suggested code survives.
+    """
+    seen = set()
+    kept = []
+    in_fence = False
+    for line in text.splitlines():
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+            kept.append(line.rstrip())
+            continue
+        if in_fence:
+            kept.append(line.rstrip())
+            continue
+        line = _without_filler(line)
+        key = " ".join(line.lower().split())
+        if not key:
+            if kept and kept[-1] == "":
+                continue
+            kept.append("")
+            continue
+        if key in seen:
+            continue
+        seen.add(key)
+        kept.append(line)
+    return "\n".join(kept).strip()
+
+
+def drop_section(text: str) -> str:
+    return ""
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model=None) -> str:
+    """Cuts text down to at most max_tokens, marking where it was cut."""
+    tokens = count_tokens(text, model)
+    if tokens <= max_tokens:
+        return text
+    if max_tokens <= count_tokens(TRUNCATION_MARKER, model):
+        return ""
+    cut = int(len(text) * max_tokens / tokens)
+    while cut > 0 and count_tokens(text[:cut] + TRUNCATION_MARKER, model) > max_tokens:
+        cut = int(cut * 0.9)
+    return text[:cut].rstrip() + TRUNCATION_MARKER if cut > 0 else ""
+
+
+# Lossy-but-safe reductions tried for each kind of section before truncation
+SUMMARISERS: Dict[str, List[Callable[[str], str]]] = {
+    "example": [drop_section],
+    "code": [strip_docstrings],
+    "review": [dedupe_boilerplate],
+    "text": [],
+}
+
+
+@dataclass
+class Section:
+    """
+    A piece of variable prompt content.
+
+    kind selects how the section may be summarised ("code", "review",
+    "example" or "text"). Sections with a lower priority are shrunk first and
+    required sections are never shrunk. Sections with truncate=False may be
+    summarised but never cut, and no section is cut below min_tokens.
+    """
+    text: str
+    kind: str = "text"
+    priority: int = 1
+    required: bool = False
+    truncate: bool = True
+    min_tokens: int = 0
+
+
+class PromptTemplate:
+    """
+    A prompt template using str.format field syntax, compiled once.
+
+    Example:
+        REVIEW = PromptTemplate("Review this code:\\n{code}")
+        prompt = REVIEW.render(model="gpt-4", code=Section(code, kind="code"))
+
+    Plain string values are treated as required sections.
+    """
+
+    def __init__(self, template: str):
+        self.template = template
+        self._chunks: List[Tuple[str, Optional[str]]] = []
+        for literal, field, spec, conversion in Formatter().parse(template):
+            if spec or conversion:
+                raise ValueError(f"Format specs are not supported in prompt templates: {field}")
+            if field is not None and not field.isidentifier():
+                raise ValueError(f"Prompt template fields must be plain names: {field}")
+            self._chunks.append((literal, field))
+        self.fields = [field for _, field in self._chunks if field is not None]
+        self._literal = "".join(literal for literal, _ in self._chunks)
+        self._literal_tokens: Dict[str, int] = {}
+
+    def literal_tokens(self, model=None) -> int:
+        name = _model_name(model)
+        if name not in self._literal_tokens:
+            self._literal_tokens[name] = count_tokens(self._literal, name)
+        return self._literal_tokens[name]
+
+    def render(self, model=None, budget: Optional[int] = None, **values: Union[str, Section]) -> str:
+        """
+        Fills the template, shrinking sections until the prompt fits the budget.
+
+        Args:
+            model: Model name used for token counting and the default budget.
+            budget (int): Overrides the number of prompt tokens allowed.
+            **values: A str or Section for every field in the template.
+
+        Returns:
+            str: The rendered prompt.
+
+        Raises:
+            PromptTooLongError: If the prompt cannot be shrunk to the budget.
+        """
+        missing = [field for field in self.fields if field not in values]
+        if missing:
+            raise KeyError(f"Missing prompt sections: {', '.join(missing)}")
+
+        sections = {
+            field: value if isinstance(value, Section) else Section(str(value), required=True)
+            for field, value in values.items()
+            if field in self.fields
+        }
+        if budget is None:
+            budget = model_budget(model)
+        texts = fit_sections(sections, budget - self.literal_tokens(model), model)
+        return "".join(
+            literal + (texts[field] if field is not None else "")
+            for literal, field in self._chunks
+        )
+
+
+def fit_sections(sections: Dict[str, Section], budget: int, model=None) -> Dict[str, str]:
+    """
+    Shrinks sections until their combined size fits in budget tokens.
+
+    All summarisers are tried first, lowest priority first, and sections are
+    truncated from the end only if the prompt is still too large after that.
+    Sections of the same priority are truncated in proportion to how far they
+    are above their min_tokens floor.
+
+    Raises:
+        PromptTooLongError: If the sections still do not fit.
+    """
+    texts = {name: section.text for name, section in sections.items()}
+    sizes = {name: count_tokens(text, model) for name, text in texts.items()}
+    if sum(sizes.values()) <= budget:
+        return texts
+
+    shrinkable = sorted(
+        (name for name, section in sections.items() if not section.required),
+        key=lambda name: sections[name].priority,
+    )
+
+    for name in shrinkable:
+        for summarise in SUMMARISERS.get(sections[name].kind, []):
+            texts[name] = summarise(texts[name])
+            sizes[name] = count_tokens(texts[name], model)
+            if sum(sizes.values()) <= budget:
+                return texts
+
+    for priority in sorted({sections[name].priority for name in shrinkable}):
+        excess = sum(sizes.values()) - budget
+        if excess <= 0:
+            break
+        group = [name for name in shrinkable if sections[name].priority == priority and sections[name].truncate]
+        room = {name: max(sizes[name] - sections[name].min_tokens, 0) for name in group}
+        group_room = sum(room.values())
+        if not group_room:
+            continue
+        for name in group:
+            cut = min(room[name], math.ceil(excess * room[name] / group_room))
+            if cut:
+                texts[name] = truncate_to_tokens(texts[name], sizes[name] - cut, model)
+                sizes[name] = count_tokens(texts[name], model)
+
+    total = sum(sizes.values())
+    if total > budget:
+        raise PromptTooLongError(f"Prompt sections need {total} tokens but only {budget} are available")
+    return texts
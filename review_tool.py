@@ -1,12 +1,99 @@
-from typing import List
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from openai import OpenAI
 import os
+import re
+import time
 from dotenv import load_dotenv
+from prompt_budget import MIN_REVIEW_TOKENS, PromptTemplate, Section
 
 # Load environment variables (like your API key)
 load_dotenv()
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+REVIEW_MODEL = "gpt-4"
+
+# Prompt templates are compiled once and trimmed to the model's token budget on render
+REVIEW_TEMPLATE = PromptTemplate("""
+You are a professional Python code reviewer.
+
+Please review the following tool function and give detailed feedback on:
+- Design and architecture
+- Input validation and error handling
+- Code clarity and maintainability
+- Security or ethical considerations (if applicable)
+- Opportunities for improvement
+- Suggestions for testing
+
+Only provide the review, not the code.
+
+Here is the tool code:
+```python
+{code}
+```
+""")
+
+REVISION_TEMPLATE = PromptTemplate("""
+You previously created a Python function based on a user request.
+
+Here is the original function code:
+```python
+{original_code}
+```
+
+Here is the feedback from a code reviewer:
+{feedback}
+
+Please revise and improve the function accordingly. Keep the same structure, inputs, and purpose. Do not remove any existing logic unless it's incorrect. Only make improvements based on the review.
+Return only the improved Python function code. Do not include any explanation, description, or markdown syntax.
+""")
+
+DIMENSION_TEMPLATE = PromptTemplate("""
+You are a professional Python code reviewer.
+
+Review the following tool function for {dimension} only:
+{focus}
+
+List each finding on its own line in the form:
+- [high|medium|low] <finding and suggested fix>
+
+Only list findings, not the code. If there is nothing to report, answer "- [low] No issues found."
+
+Here is the tool code:
+```python
+{code}
+```
+""")
+
+# Parallel review: each dimension is a separate, shorter request.
+# Dimensions that need deeper reasoning go to the larger model.
+REVIEW_DIMENSIONS: Dict[str, Tuple[str, str]] = {
+    "Design and architecture": ("gpt-4", "Structure, responsibilities, naming and how the tool fits its purpose."),
+    "Input validation and error handling": ("gpt-4", "Type and value checks, edge cases, exceptions and failure messages."),
+    "Code clarity and maintainability": ("gpt-3.5-turbo", "Readability, docstrings, type hints and duplication."),
+    "Security and ethical considerations": ("gpt-4", "Injection, unsafe evaluation, secrets, network and scraping concerns."),
+    "Opportunities for improvement": ("gpt-3.5-turbo", "Performance, simplifications and missing features."),
+    "Suggestions for testing": ("gpt-3.5-turbo", "Unit tests and edge cases that should be covered."),
+}
+SEVERITIES = ("high", "medium", "low")
+# Only bullet or numbered lines are findings; the tag may be bold, e.g. "- **[high]** ..."
+FINDING_PATTERN = re.compile(
+    r"^\s*(?:[-*•]|\d+[.)])\s+(?:\**\[\**(high|medium|low)\**\]\**)?\s*(.+)$", re.IGNORECASE
+)
+NO_ISSUES = "no issues found"  # what a dimension answers when it has nothing to report
+DUPLICATE_SIMILARITY = 0.7  # word overlap above which two findings are merged
+DIMENSION_TIMEOUT = 60.0  # seconds to wait for the dimensions before reporting them as not reviewed
+
+FEEDBACK_ONLY_TEMPLATE = PromptTemplate("""
+You previously created a Python function based on a user request.
+
+Here is the feedback from a code reviewer:
+{feedback}
+
+Please revise and improve the function accordingly. Keep the same structure and inputs, but enhance the implementation based on the review.
+Return only the updated Python function code. Do not include any explanation, description, or markdown syntax.
+""")
+
 def strip_code_noise(code: str) -> str:
     """
     Cleans code output from GPT-style tools by removing:
@@ -24,69 +111,162 @@ def strip_code_noise(code: str) -> str:
     )
     return cleaned.strip()
 
-def review_tool(code: str) -> str:
+def review_tool(code: str, parallel: bool = False) -> str:
     """
     Uses GPT-4 to review a Python tool function and provide structured feedback
     on design, error handling, clarity, testability, and suggestions for improvement.
 
     Args:
         code (str): The full Python code of the tool function.
+        parallel (bool): Review each dimension as its own concurrent request (see parallel_review).
 
     Returns:
         str: A structured code review summary.
     """
-    prompt = f"""
-You are a professional Python code reviewer.
-
-Please review the following tool function and give detailed feedback on:
-- Design and architecture
-- Input validation and error handling
-- Code clarity and maintainability
-- Security or ethical considerations (if applicable)
-- Opportunities for improvement
-- Suggestions for testing
-
-Only provide the review, not the code.
+    if parallel:
+        return parallel_review(code)
 
-Here is the tool code:
-```python
-{code}
-```
-"""
+    prompt = REVIEW_TEMPLATE.render(model=REVIEW_MODEL, code=Section(code, kind="code"))
 
     response = client.chat.completions.create(
-        model="gpt-4",
+        model=REVIEW_MODEL,
         messages=[{"role": "user", "content": prompt}]
     )
 
     return response.choices[0].message.content.strip()
 
-def tool_prompt(original_code=None, feedback=None):
-    if feedback and original_code:
-        return f"""
-You previously created a Python function based on a user request.
+def _review_dimension(code: str, dimension: str, model: str, focus: str, timeout: float = DIMENSION_TIMEOUT) -> str:
+    prompt = DIMENSION_TEMPLATE.render(
+        model=model,
+        dimension=dimension,
+        focus=focus,
+        code=Section(code, kind="code"),
+    )
+    # No retries: a slow dimension is reported as not reviewed rather than holding up the others
+    response = client.with_options(timeout=timeout, max_retries=0).chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}]
+    )
+    return response.choices[0].message.content.strip()
 
-Here is the original function code:
-```python
-{original_code}
-```
+def parse_findings(text: str, dimension: str) -> List[Dict]:
+    """
+    Splits a dimension review into findings with a severity.
 
-Here is the feedback from a code reviewer:
-{feedback}
+    Only bullet and numbered lines count; headings and prose are skipped.
+    Lines without a [high|medium|low] tag are treated as medium severity.
+    """
+    findings = []
+    for line in text.splitlines():
+        match = FINDING_PATTERN.match(line)
+        if not match or not match.group(2).strip():
+            continue
+        if match.group(2).strip(" .*").lower() == NO_ISSUES:
+            continue
+        findings.append({
+            "severity": (match.group(1) or "medium").lower(),
+            "text": match.group(2).strip(),
+            "dimensions": [dimension],
+        })
+    return findings
 
-Please revise and improve the function accordingly. Keep the same structure, inputs, and purpose. Do not remove any existing logic unless it's incorrect. Only make improvements based on the review.
-Return only the improved Python function code. Do not include any explanation, description, or markdown syntax.
-"""
-    elif feedback:
-        return f"""
-You previously created a Python function based on a user request.
+def _words(text: str) -> set:
+    return set(re.findall(r"[a-z0-9]+", text.lower()))
 
-Here is the feedback from a code reviewer:
-{feedback}
+def merge_findings(findings: List[Dict]) -> List[Dict]:
+    """
+    Deduplicates findings reported by several dimensions.
 
-Please revise and improve the function accordingly. Keep the same structure and inputs, but enhance the implementation based on the review.
-Return only the updated Python function code. Do not include any explanation, description, or markdown syntax.
-"""
+    Findings whose words overlap by at least DUPLICATE_SIMILARITY are merged,
+    keeping the highest severity and every dimension that reported them.
+    The result is sorted by severity.
+    """
+    merged: List[Dict] = []
+    for finding in findings:
+        words = _words(finding["text"])
+        for existing in merged:
+            existing_words = _words(existing["text"])
+            union = words | existing_words
+            if union and len(words & existing_words) / len(union) >= DUPLICATE_SIMILARITY:
+                if SEVERITIES.index(finding["severity"]) < SEVERITIES.index(existing["severity"]):
+                    existing["severity"] = finding["severity"]
+                for dimension in finding["dimensions"]:
+                    if dimension not in existing["dimensions"]:
+                        existing["dimensions"].append(dimension)
+                break
+        else:
+            merged.append(dict(finding, dimensions=list(finding["dimensions"])))
+    return sorted(merged, key=lambda finding: SEVERITIES.index(finding["severity"]))
+
+def parallel_review(
+    code: str, dimensions: Optional[Dict[str, Tuple[str, str]]] = None, timeout: float = DIMENSION_TIMEOUT
+) -> str:
+    """
+    Reviews a tool with one concurrent request per review dimension.
+
+    Each dimension is a short request, possibly to a different model, so the
+    review takes about as long as the slowest of them. The answers are merged
+    into one review with deduplicated findings grouped by severity. A dimension
+    that fails or does not answer within timeout seconds is reported in the
+    review instead of failing or holding up the whole review.
+
+    Args:
+        code (str): The full Python code of the tool function.
+        dimensions (dict): Maps a dimension to its (model, focus). Defaults to REVIEW_DIMENSIONS.
+        timeout (float): Seconds to wait for all dimensions.
+
+    Returns:
+        str: A structured code review summary.
+    """
+    dimensions = dimensions or REVIEW_DIMENSIONS
+    findings: List[Dict] = []
+    failures: Dict[str, Exception] = {}
+
+    executor = ThreadPoolExecutor(max_workers=len(dimensions))
+    deadline = time.monotonic() + timeout
+    try:
+        futures = {
+            dimension: executor.submit(_review_dimension, code, dimension, model, focus, timeout)
+            for dimension, (model, focus) in dimensions.items()
+        }
+        for dimension, future in futures.items():
+            try:
+                findings.extend(parse_findings(future.result(max(deadline - time.monotonic(), 0)), dimension))
+            except FutureTimeoutError:
+                failures[dimension] = TimeoutError(f"no answer within {timeout:g}s")
+            except Exception as e:
+                failures[dimension] = e
+    finally:
+        # Do not wait for dimensions that are still running
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if len(failures) == len(dimensions):
+        raise next(iter(failures.values()))
+
+    sections = []
+    merged = merge_findings(findings)
+    for severity in SEVERITIES:
+        lines = [
+            f"- {finding['text']} ({', '.join(finding['dimensions'])})"
+            for finding in merged
+            if finding["severity"] == severity
+        ]
+        if lines:
+            sections.append(f"{severity.capitalize()} severity:\n" + "\n".join(lines))
+    if failures:
+        sections.append("Not reviewed:\n" + "\n".join(
+            f"- {dimension}: {str(e)}" for dimension, e in failures.items()
+        ))
+    return "\n\n".join(sections) or "No issues found."
+
+def tool_prompt(original_code=None, feedback=None):
+    if feedback is not None and original_code:
+        return REVISION_TEMPLATE.render(
+            original_code=Section(original_code, kind="code", priority=2, truncate=False),
+            feedback=Section(feedback, kind="review", priority=2, min_tokens=MIN_REVIEW_TOKENS),
+        )
+    elif feedback is not None:
+        return FEEDBACK_ONLY_TEMPLATE.render(feedback=Section(feedback, kind="review"))
 
         return f"""
 Write a complete Python function called `{tool_name}`.
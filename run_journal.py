@@ -0,0 +1,146 @@
+"""
+Append-only journal of toolsmith runs.
+
+Every completed stage (request, plan, generated code, review, improved code)
+is appended to a JSON Lines file together with its input and metadata, and
+flushed to disk before the next stage starts. If a run is interrupted, the
+next run for the same session can resume from the last completed stage
+instead of paying for the same LLM calls again.
+
+Usage:
+    journal = RunJournal.for_session("email_extractor")
+    review = journal.run_stage("review", code, lambda: review_tool(code))
+
+Batch scripts can use one session per batch and a stage per item, e.g.
+journal.run_stage(f"generate:{tool_name}", prompt, generate).
+"""
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+JOURNAL_DIR = "runs"
+START_STAGE = "session_start"
+DONE_STAGE = "done"
+
+
+def _input_hash(value: Any) -> str:
+    data = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class RunJournal:
+    """
+    A session journal stored as one JSON record per line.
+
+    The file is only ever appended to. Starting a new session appends a
+    session_start marker and only records after the last marker count.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records: List[Dict] = []
+        self._needs_newline = False
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    self._needs_newline = not line.endswith("\n")
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line cut short by a crash; everything before it is intact
+                        continue
+                    if record.get("stage") == START_STAGE:
+                        self.records = []
+                    self.records.append(record)
+
+    @classmethod
+    def for_session(cls, session: str, directory: str = JOURNAL_DIR) -> "RunJournal":
+        """Opens the journal of a named session, e.g. the tool being generated."""
+        os.makedirs(directory, exist_ok=True)
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", session) or "session"
+        return cls(os.path.join(directory, f"{name}.jsonl"))
+
+    def _append(self, record: Dict) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            if self._needs_newline:
+                f.write("\n")
+                self._needs_newline = False
+            f.write(json.dumps(record, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.records.append(record)
+
+    def start(self, **metadata) -> None:
+        """Starts a new session, so earlier stages are no longer reused."""
+        self.records = []
+        self._append({"stage": START_STAGE, "time": time.time(), "metadata": metadata})
+
+    def record(self, stage: str, input: Any = None, output: Any = None, **metadata) -> None:
+        """
+        Checkpoints a completed stage.
+
+        Args:
+            stage (str): Name of the stage, e.g. "plan" or "review".
+            input: What the stage was run on; used to check a resumed stage still applies.
+            output: The stage's result. Must be JSON serialisable.
+            **metadata: Anything else worth keeping, such as the model or duration.
+        """
+        self._append({
+            "stage": stage,
+            "time": time.time(),
+            "input": input,
+            "input_hash": _input_hash(input),
+            "output": output,
+            "metadata": metadata,
+        })
+
+    def completed(self, stage: str) -> Optional[Dict]:
+        """Returns the latest record of a stage in this session, if any."""
+        for record in reversed(self.records):
+            if record.get("stage") == stage:
+                return record
+        return None
+
+    def output(self, stage: str, default: Any = None) -> Any:
+        record = self.completed(stage)
+        return record["output"] if record else default
+
+    def last_stage(self) -> Optional[str]:
+        stages = [record["stage"] for record in self.records if record.get("stage") != START_STAGE]
+        return stages[-1] if stages else None
+
+    def resumable(self) -> bool:
+        """True if the session has completed stages but was never finished."""
+        return self.last_stage() not in (None, DONE_STAGE)
+
+    def finish(self, **metadata) -> None:
+        self.record(DONE_STAGE, **metadata)
+
+    def run_stage(self, stage: str, input: Any, compute: Callable[[], Any], **metadata) -> Any:
+        """
+        Returns the stage's recorded output, or computes and records it.
+
+        A recorded output is only reused if it was produced from the same input.
+        A stage that returns None is not recorded, so it is retried next time.
+
+        Args:
+            stage (str): Name of the stage.
+            input: What the stage runs on, e.g. the prompt or the code under review.
+            compute (Callable): Produces the stage's output when it is not recorded.
+            **metadata: Stored with the record.
+
+        Returns:
+            The stage's output.
+        """
+        record = self.completed(stage)
+        if record is not None and record.get("input_hash") == _input_hash(input):
+            return record["output"]
+
+        started = time.time()
+        output = compute()
+        if output is not None:
+            self.record(stage, input, output, duration=round(time.time() - started, 3), **metadata)
+        return output
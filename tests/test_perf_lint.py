@@ -0,0 +1,217 @@
+from perf_lint import fix, lint
+
+
+def rules(findings, fixed=None):
+    return [finding.rule for finding in findings if fixed is None or finding.fixed == fixed]
+
+
+def test_regex_is_compiled_once_at_module_level():
+    code = (
+        "import re\n"
+        "\n"
+        "def emails(text):\n"
+        "    return re.findall(r'\\S+@\\S+', text)\n"
+    )
+
+    fixed, findings = fix(code)
+
+    assert fixed == (
+        "import re\n"
+        "\n"
+        "_PATTERN = re.compile(r'\\S+@\\S+')\n"
+        "\n"
+        "def emails(text):\n"
+        "    return _PATTERN.findall(text)\n"
+    )
+    assert rules(findings, fixed=True) == ["regex-in-function"]
+
+
+def test_regex_that_does_not_compile_is_not_hoisted():
+    code = (
+        "import re\n"
+        "\n"
+        "def group(s):\n"
+        "    if s:\n"
+        "        return re.compile('(')\n"
+    )
+
+    assert fix(code) == (code, [])
+
+
+def test_regex_is_not_hoisted_when_re_is_rebound_in_the_function():
+    code = (
+        "import re\n"
+        "\n"
+        "def search(text, re=re):\n"
+        "    return re.search('a+', text)\n"
+    )
+
+    assert fix(code) == (code, [])
+
+
+def test_requests_timeout_is_added():
+    code = "import requests\nresponse = requests.get(url, headers=headers)\n"
+
+    fixed, findings = fix(code)
+
+    assert fixed == "import requests\nresponse = requests.get(url, headers=headers, timeout=10)\n"
+    assert rules(findings, fixed=True) == ["requests-timeout"]
+
+
+def test_requests_timeout_goes_before_a_comment_on_the_last_argument():
+    code = (
+        "import requests\n"
+        "response = requests.get(\n"
+        "    url,  # the search page\n"
+        ")\n"
+    )
+
+    fixed, findings = fix(code)
+
+    assert fixed == (
+        "import requests\n"
+        "response = requests.get(\n"
+        "    url, timeout=10  # the search page\n"
+        ")\n"
+    )
+    assert rules(findings, fixed=True) == ["requests-timeout"]
+
+
+def test_find_all_slice_becomes_limit():
+    code = (
+        "from bs4 import BeautifulSoup\n"
+        "soup = BeautifulSoup(html, 'html.parser')\n"
+        "table = soup.find('table')\n"
+        "rows = table.find_all('tr')[:5]\n"
+        "links = soup.find_all('a', class_='title'  # product links\n"
+        ")[:3]\n"
+    )
+
+    fixed, findings = fix(code)
+
+    assert fixed == (
+        "from bs4 import BeautifulSoup\n"
+        "soup = BeautifulSoup(html, 'html.parser')\n"
+        "table = soup.find('table')\n"
+        "rows = table.find_all('tr', limit=5)\n"
+        "links = soup.find_all('a', class_='title', limit=3  # product links\n"
+        ")\n"
+    )
+    assert rules(findings, fixed=True) == ["find-all-slice", "find-all-slice"]
+
+
+def test_find_all_slice_is_left_alone_for_zero_and_unknown_receivers():
+    code = (
+        "from bs4 import BeautifulSoup\n"
+        "soup = BeautifulSoup(html, 'html.parser')\n"
+        "none = soup.find_all('a')[:0]\n"
+        "rows = client.find_all('rows')[:5]\n"
+    )
+
+    fixed, findings = fix(code)
+
+    assert fixed == code
+    assert "find-all-slice" not in rules(findings)
+
+
+def test_repeated_str_method_is_computed_once():
+    code = (
+        "def greet(name):\n"
+        "    if name.lower() == 'bob':\n"
+        "        return 'Hi Bob'\n"
+        "    return 'Hello ' + name.lower()\n"
+    )
+
+    fixed, findings = fix(code)
+
+    assert fixed == (
+        "def greet(name):\n"
+        "    name_lower = name.lower()\n"
+        "    if name_lower == 'bob':\n"
+        "        return 'Hi Bob'\n"
+        "    return 'Hello ' + name_lower\n"
+    )
+    assert rules(findings, fixed=True) == ["repeated-str-method"]
+
+
+def test_repeated_str_method_behind_a_short_circuit_is_not_hoisted():
+    code = (
+        "def greet(name):\n"
+        "    if name and name.lower() == 'bob':\n"
+        "        return 'Hi Bob'\n"
+        "    return 'Hello ' + name.lower()\n"
+    )
+
+    fixed, findings = fix(code)
+
+    assert fixed == code
+    assert rules(findings, fixed=False) == ["repeated-str-method"]
+
+
+def test_repeated_str_method_is_not_hoisted_before_earlier_calls():
+    code = (
+        "def greet(name):\n"
+        "    greeting = prefix(name) + name.lower()\n"
+        "    return greeting + name.lower()\n"
+    )
+
+    fixed, findings = fix(code)
+
+    assert fixed == code
+    assert rules(findings, fixed=False) == ["repeated-str-method"]
+
+
+def test_lint_does_not_claim_a_fix():
+    findings = lint("import requests\nrequests.get(url)\n")
+
+    assert str(findings[0]) == (
+        "line 2: [requests-timeout] requests.get without a timeout can hang forever; give it timeout=10 (warning)"
+    )
+
+
+def test_reported_only_rules():
+    code = (
+        "def collect(items):\n"
+        "    text = ''\n"
+        "    seen = []\n"
+        "    for item in items:\n"
+        "        text += f'{item},'\n"
+        "        if item not in seen:\n"
+        "            seen.append(item)\n"
+        "    return text\n"
+    )
+
+    assert rules(lint(code)) == ["string-concat-loop", "list-membership-loop"]
+    assert fix(code)[0] == code
+
+
+def test_fix_reports_lines_of_the_original_code():
+    code = (
+        "import re\n"
+        "import requests\n"
+        "\n"
+        "def fetch(url):\n"
+        "    if re.match(r'https?://', url):\n"
+        "        return requests.get(url)\n"
+    )
+
+    fixed, findings = fix(code)
+
+    assert [(finding.rule, finding.line) for finding in findings] == [
+        (finding.rule, finding.line) for finding in lint(code)
+    ]
+    assert {finding.rule: finding.line for finding in findings}["requests-timeout"] == 6
+    assert "_PATTERN.match(url)" in fixed and "requests.get(url, timeout=10)" in fixed
+
+
+def test_fenced_code_is_fixed_inside_the_fence():
+    code = "Here is the tool:\n```python\nimport requests\nrequests.get(url)\n```\n"
+
+    fixed, findings = fix(code)
+
+    assert fixed == "Here is the tool:\n```python\nimport requests\nrequests.get(url, timeout=10)\n```\n"
+    assert [finding.line for finding in findings] == [4]
+
+
+def test_code_that_does_not_parse_is_unchanged():
+    assert fix("def broken(:\n") == ("def broken(:\n", [])
@@ -0,0 +1,99 @@
+import pytest
+
+from prompt_budget import (
+    PromptTemplate,
+    PromptTooLongError,
+    Section,
+    count_tokens,
+    dedupe_boilerplate,
+    strip_docstrings,
+)
+
+REVISION = PromptTemplate("{code}\n--\n{feedback}")
+
+
+def test_strip_docstrings_removes_docstrings_on_their_own_lines():
+    code = 'def g():\n    """Doc."""\n    return 1\n'
+    assert strip_docstrings(code) == "def g():\n    return 1"
+
+
+def test_strip_docstrings_keeps_a_placeholder_for_docstring_only_bodies():
+    assert strip_docstrings('def g():\n    """Doc."""\n') == "def g():\n    ..."
+
+
+def test_strip_docstrings_keeps_docstrings_sharing_a_line():
+    code = 'class A: "doc"\ndef f(x): "d"; return x\ndef h():\n    "x"; y = 1'
+    assert strip_docstrings(code) == code
+
+
+def test_equal_priority_sections_are_truncated_in_proportion():
+    template = PromptTemplate("{code}\n--\n{feedback}")
+    prompt = template.render(
+        budget=200,
+        code=Section("x = 1\n" * 400, kind="code", priority=2),
+        feedback=Section("".join(f"issue {i} here\n" for i in range(300)), kind="review", priority=2),
+    )
+    code, feedback = prompt.split("\n--\n")
+    assert count_tokens(code) > 0
+    assert count_tokens(feedback) > 0
+    assert count_tokens(prompt) <= 200 + template.literal_tokens()
+
+
+def test_short_feedback_is_kept_whole_next_to_large_code():
+    code = "".join(f'def f{i}():\n    """Doc {i} " + "x" * 400 + """."""\n    return {i}\n' for i in range(40))
+    feedback = "- [high] Add a timeout to the request"
+    prompt = REVISION.render(
+        budget=800,
+        code=Section(code, kind="code", priority=2, truncate=False),
+        feedback=Section(feedback, kind="review", priority=2, min_tokens=300),
+    )
+    stripped, kept_feedback = prompt.split("\n--\n")
+    assert kept_feedback == feedback
+    assert stripped == strip_docstrings(code)
+
+
+def test_feedback_is_cut_from_the_end_down_to_its_floor():
+    feedback = "".join(f"- issue {i} here\n" for i in range(300))
+    prompt = REVISION.render(
+        budget=400,
+        code=Section("x = 1\n" * 200, kind="code", priority=2, truncate=False),
+        feedback=Section(feedback, kind="review", priority=2, min_tokens=100),
+    )
+    code, kept_feedback = prompt.split("\n--\n")
+    assert code.count("x = 1") == 200
+    assert kept_feedback.startswith("- issue 0 here")
+    assert kept_feedback.endswith("[truncated]")
+
+
+def test_code_that_cannot_be_truncated_raises_instead_of_being_cut():
+    with pytest.raises(PromptTooLongError):
+        REVISION.render(
+            budget=100,
+            code=Section("x = 1\n" * 400, kind="code", priority=2, truncate=False),
+            feedback=Section("- fix it", kind="review", priority=2, min_tokens=100),
+        )
+
+
+def test_dedupe_boilerplate_keeps_code_blocks_and_verdicts():
+    review = "\n".join([
+        "Here is my review:",
+        "- Use a session.",
+        "```python",
+        "session = requests.Session()",
+        "```",
+        "- Use a session.",
+        "```python",
+        "session = requests.Session()",
+        "```",
+        "Overall, the tool needs error handling before it is used. I hope this helps!",
+    ])
+    assert dedupe_boilerplate(review) == "\n".join([
+        "- Use a session.",
+        "```python",
+        "session = requests.Session()",
+        "```",
+        "```python",
+        "session = requests.Session()",
+        "```",
+        "Overall, the tool needs error handling before it is used.",
+    ])
@@ -0,0 +1,74 @@
+import os
+import time
+
+import pytest
+
+pytest.importorskip("openai")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import review_tool
+from review_tool import merge_findings, parallel_review, parse_findings, tool_prompt
+
+DIMENSIONS = {"Design": ("gpt-4", "Structure."), "Security": ("gpt-4", "Injection."), "Testing": ("gpt-4", "Tests.")}
+
+
+def test_parse_findings_reads_bullets_and_numbered_lines_only():
+    text = "\n".join([
+        "### Input validation",
+        "The function mostly looks fine.",
+        "- [high] No timeout on the HTTP request",
+        "2. **[low]** Docstring does not mention the return type",
+        "* Missing type hint for `limit`",
+    ])
+
+    findings = parse_findings(text, "Input validation")
+
+    assert [(finding["severity"], finding["text"]) for finding in findings] == [
+        ("high", "No timeout on the HTTP request"),
+        ("low", "Docstring does not mention the return type"),
+        ("medium", "Missing type hint for `limit`"),
+    ]
+
+
+def test_parse_findings_drops_no_issues_marker():
+    assert parse_findings("- [low] No issues found.", "Security") == []
+    assert parse_findings("1. **[low]** no issues found", "Security") == []
+
+
+def test_merge_findings_keeps_highest_severity():
+    findings = parse_findings("- [low] Add a timeout to the request", "Design") + parse_findings(
+        "- [high] Add a timeout to the request", "Security"
+    )
+
+    merged = merge_findings(findings)
+
+    assert len(merged) == 1
+    assert merged[0]["severity"] == "high"
+    assert merged[0]["dimensions"] == ["Design", "Security"]
+
+
+def test_parallel_review_reports_failed_and_overdue_dimensions(monkeypatch):
+    def review_dimension(code, dimension, model, focus, timeout):
+        if dimension == "Security":
+            raise RuntimeError("rate limited")
+        if dimension == "Testing":
+            time.sleep(2)
+        return "- [high] No timeout on the HTTP request"
+
+    monkeypatch.setattr(review_tool, "_review_dimension", review_dimension)
+    started = time.monotonic()
+
+    review = parallel_review("def f(): pass", DIMENSIONS, timeout=0.5)
+
+    assert time.monotonic() - started < 1.5
+    assert "- No timeout on the HTTP request (Design)" in review
+    assert "Not reviewed:\n- Security: rate limited\n- Testing: no answer within 0.5s" in review
+
+
+def test_parallel_review_says_when_nothing_was_found(monkeypatch):
+    monkeypatch.setattr(review_tool, "_review_dimension", lambda *args: "- [low] No issues found.")
+
+    review = parallel_review("def f(): pass", DIMENSIONS)
+
+    assert review == "No issues found."
+    assert "def f(): pass" in tool_prompt(original_code="def f(): pass", feedback="")
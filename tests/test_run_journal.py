@@ -0,0 +1,62 @@
+import json
+
+from run_journal import RunJournal
+
+
+def test_torn_last_line_is_skipped_and_the_next_record_starts_a_new_line(tmp_path):
+    path = tmp_path / "session.jsonl"
+    journal = RunJournal(str(path))
+    journal.start()
+    journal.record("plan", "prompt", {"steps": 1})
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"stage": "generate", "output": "def f(')
+
+    resumed = RunJournal(str(path))
+    assert resumed.last_stage() == "plan"
+    resumed.record("generate", "plan", "def f(): pass")
+
+    assert RunJournal(str(path)).output("generate") == "def f(): pass"
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[-1])["stage"] == "generate"
+
+
+def test_only_records_after_the_last_session_start_count(tmp_path):
+    path = str(tmp_path / "session.jsonl")
+    journal = RunJournal(path)
+    journal.start()
+    journal.record("plan", "old prompt", "old plan")
+    journal.finish()
+    journal.start()
+
+    reopened = RunJournal(path)
+    assert reopened.completed("plan") is None
+    assert not reopened.resumable()
+
+    reopened.record("plan", "new prompt", "new plan")
+    assert RunJournal(path).resumable()
+    assert RunJournal(path).output("plan") == "new plan"
+
+
+def test_run_stage_reuses_output_only_for_the_same_input(tmp_path):
+    journal = RunJournal(str(tmp_path / "session.jsonl"))
+    journal.start()
+    calls = []
+
+    def review():
+        calls.append(1)
+        return f"review {len(calls)}"
+
+    assert journal.run_stage("review", "code v1", review) == "review 1"
+    assert journal.run_stage("review", "code v1", review) == "review 1"
+    assert journal.run_stage("review", "code v2", review) == "review 2"
+    assert len(calls) == 2
+
+
+def test_run_stage_does_not_record_none(tmp_path):
+    path = str(tmp_path / "session.jsonl")
+    journal = RunJournal(path)
+    journal.start()
+
+    assert journal.run_stage("generate", "plan", lambda: None) is None
+    assert RunJournal(path).completed("generate") is None
+    assert journal.run_stage("generate", "plan", lambda: "def f(): pass") == "def f(): pass"
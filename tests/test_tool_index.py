@@ -0,0 +1,70 @@
+import json
+import os
+
+from tool_index import ToolIndex, tokenize
+
+GREETER = '''
+class Greeter:
+    """Greets a person by name depending on the time of day."""
+
+    def run(self, name: str, time_of_day: str) -> str:
+        return f"Good {time_of_day}, {name}!"
+'''
+
+PRICES = '''
+def game_prices(console: str) -> list:
+    """Scrapes the store for the names and prices of games for a console."""
+    return []
+'''
+
+
+def write(path, text, mtime=None):
+    path.write_text(text)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def test_tokenize_drops_stopwords_before_stemming():
+    assert tokenize("This tool parses args and parameters") == ["parse"]
+    assert tokenize("greetingsByTimeOfDay") == ["greet", "time", "day"]
+
+
+def test_update_only_reindexes_new_changed_and_deleted_files(tmp_path):
+    tools = tmp_path / "tools"
+    tools.mkdir()
+    greeter = write(tools / "greeter.py", GREETER, mtime=1000)
+    prices = write(tools / "prices.py", PRICES, mtime=1000)
+    index = ToolIndex(str(tmp_path / "index.json"))
+
+    assert index.update([str(tools)]) == 2
+    assert index.update([str(tools)]) == 0
+
+    write(tools / "greeter.py", GREETER.replace("Greets", "Welcomes"), mtime=2000)
+    os.remove(prices)
+    assert index.update([str(tools)]) == 2
+    assert list(index.entries) == [os.path.normpath(greeter)]
+    assert index.entries[os.path.normpath(greeter)]["summary"].startswith("Welcomes")
+
+    reloaded = ToolIndex.load(index.path)
+    assert reloaded.entries == index.entries
+
+
+def test_index_from_an_older_version_is_rebuilt(tmp_path):
+    path = tmp_path / "index.json"
+    path.write_text(json.dumps({"entries": {"old.py": {"terms": {"thi": 1}}}}))
+
+    assert ToolIndex.load(str(path)).entries == {}
+
+
+def test_best_match_requires_the_requested_parameters(tmp_path):
+    greeter = write(tmp_path / "greeter.py", GREETER)
+    write(tmp_path / "prices.py", PRICES)
+    index = ToolIndex(str(tmp_path / "index.json"))
+    index.update([str(tmp_path)])
+    query = "greet a person by name for the time of day"
+
+    assert index.best_match(query)[1] == os.path.normpath(greeter)
+    assert index.best_match(query, params=["name: str", "time_of_day: str"])[1] == os.path.normpath(greeter)
+    assert index.best_match(query, params=["name: str"]) is None
+    assert index.best_match("prices of xbox games", params=["game: str"]) is None
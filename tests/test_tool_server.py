@@ -0,0 +1,124 @@
+import json
+import os
+import socket
+import stat
+import threading
+import time
+
+import pytest
+
+import tool_metrics
+from tool_server import ToolServer, WorkerPool, call_tool, load_tool
+
+SLOW_TOOL = '''
+import json
+import os
+import socket
+import stat
+import threading
+import time
+
+
+def slow_tool(seconds):
+    """Sleeps, then returns the id of the worker process that ran it."""
+    time.sleep(seconds)
+    return os.getpid()
+'''
+
+
+@pytest.fixture
+def tool_path(tmp_path):
+    path = tmp_path / "slow_tool.py"
+    path.write_text(SLOW_TOOL)
+    return str(path)
+
+
+def test_calls_to_the_same_tool_run_in_parallel(tool_path):
+    pool = WorkerPool({"slow": tool_path}, workers=4, batch_size=8)
+    try:
+        pool.call("slow", {"seconds": 0})  # wait for the workers to start
+        started = time.monotonic()
+        futures = [pool.submit("slow", {"seconds": 1}) for _ in range(4)]
+        pids = {future.result() for future in futures}
+        elapsed = time.monotonic() - started
+    finally:
+        pool.close()
+
+    assert len(pids) == 4
+    assert elapsed < 2.5
+
+
+def test_timeout_counts_from_submit(tool_path):
+    pool = WorkerPool({"slow": tool_path}, workers=1, batch_size=8, batch_window=0.1)
+    try:
+        pool.call("slow", {"seconds": 0})
+        futures = [pool.submit("slow", {"seconds": 0.6}, timeout=1.0) for _ in range(3)]
+        started = time.monotonic()
+        assert futures[0].result()
+        for future in futures[1:]:
+            with pytest.raises(TimeoutError):
+                future.result()
+        # The second call is stopped at its deadline, the third is not run at all
+        assert time.monotonic() - started < 1.5
+    finally:
+        pool.close()
+
+
+def test_unsendable_arguments_fail_the_call_not_the_pool(tool_path):
+    pool = WorkerPool({"slow": tool_path}, workers=1)
+    try:
+        with pytest.raises(Exception):
+            pool.call("slow", {"seconds": lambda: 0})
+        assert pool.call("slow", {"seconds": 0}) != os.getpid()
+    finally:
+        pool.close()
+
+
+def test_load_tool_records_metrics_when_asked(tool_path):
+    run = load_tool(tool_path, metrics=True)
+    tool_metrics.enable()
+    try:
+        run(seconds=0)
+        snapshot = tool_metrics.metrics.snapshot()
+    finally:
+        tool_metrics.disable()
+        tool_metrics.metrics.reset()
+
+    assert snapshot["slow_tool"]["calls"] == 1
+    assert snapshot["slow_tool"]["errors"] == 0
+
+
+@pytest.fixture
+def server(tool_path, tmp_path):
+    pool = WorkerPool({"slow": tool_path}, workers=2)
+    server = ToolServer(pool, str(tmp_path / "tools.sock"))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    pool.close()
+
+
+def test_requests_on_one_connection_are_answered_as_they_finish(server):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(server.server_address)
+        requests = [
+            {"id": "slow", "tool": "slow", "args": {"seconds": 1}},
+            {"id": "fast", "tool": "slow", "args": {"seconds": 0}},
+            {"id": "bad", "tool": "missing"},
+        ]
+        connection.sendall("".join(json.dumps(request) + "\n" for request in requests).encode("utf-8"))
+        connection.shutdown(socket.SHUT_WR)
+        with connection.makefile("r", encoding="utf-8") as reader:
+            answers = [json.loads(line) for line in reader]
+
+    assert [answer["id"] for answer in answers] == ["bad", "fast", "slow"]
+    assert [answer["ok"] for answer in answers] == [False, True, True]
+
+
+def test_socket_is_private_and_not_taken_over(server, tool_path):
+    assert stat.S_IMODE(os.stat(server.server_address).st_mode) == 0o600
+
+    with pytest.raises(OSError):
+        ToolServer(server.pool, server.server_address)
+    assert call_tool("slow", {"seconds": 0}, socket_path=server.server_address)
@@ -0,0 +1,330 @@
+"""
+Local similarity index over generated tools.
+
+Each indexed file is reduced to the names, docstrings, `description` fields
+and signatures of the functions and classes it defines. Queries are ranked
+with TF-IDF cosine similarity, so an existing tool can be offered before
+asking the LLM to write a new one. Everything runs offline and the index is
+stored as a small JSON file that is updated one file at a time.
+
+Usage:
+    python tool_index.py [paths...]    # (re)index files or directories
+    python tool_index.py -q "greet someone by time of day"
+"""
+import ast
+import json
+import math
+import os
+import re
+import sys
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+INDEX_FILE = "tool_index.json"
+INDEX_VERSION = 2  # bump when tokenize() changes, so old entries are extracted again
+TOOL_DIRECTORIES = [".", "experiements"]  # where toolsmith and the experiments save tools
+REUSE_THRESHOLD = 0.5  # similarity at which an existing tool is offered
+NAME_WEIGHT = 3  # names say more about a tool than its docstring
+
+# Repository modules that are not generated tools
+EXCLUDED_FILES = {
+    "toolsmith.py",
+    "review_tool.py",
+    "prompt_budget.py",
+    "perf_lint.py",
+    "run_journal.py",
+    "tool_server.py",
+    "tool_metrics.py",
+    "tool_index.py",
+    "dynamictools.py",
+}
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "if", "in",
+    "into", "is", "it", "its", "of", "on", "or", "that", "the", "this", "to",
+    "with", "str", "self", "ctx", "none", "return", "returns", "args",
+    "parameters", "tool", "create", "given",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Splits text and identifiers (snake_case and CamelCase) into lowercase terms."""
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text)
+    words = re.findall(r"[A-Za-z][A-Za-z0-9]*", text.replace("_", " "))
+    terms = []
+    for word in words:
+        word = word.lower()
+        if word in STOPWORDS:
+            continue
+        word = stem(word)
+        if len(word) > 1 and word not in STOPWORDS:
+            terms.append(word)
+    return terms
+
+
+def stem(word: str) -> str:
+    """A very small suffix stripper so "greetings", "greeter" and "greet" match."""
+    for suffix in ("ings", "ing", "ers", "er", "ed", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not word.endswith("ss"):
+            return word[:-len(suffix)]
+    return word
+
+
+def _source_without_fences(source: str) -> str:
+    """Generated files sometimes keep markdown fences and notes around the code."""
+    if "```" not in source:
+        return source
+    start = source.find("```") + 3
+    end = source.rfind("```")
+    if end <= start:
+        end = len(source)
+    if source[start:start + 6] == "python":
+        start += 6
+    return source[start:end]
+
+
+def _describe_source(source: str) -> Dict[str, List[str]]:
+    """Collects names, signatures, docstrings and description fields from code."""
+    info: Dict[str, List[str]] = {"names": [], "signatures": [], "descriptions": [], "docs": []}
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        try:
+            tree = ast.parse(_source_without_fences(source))
+        except SyntaxError:
+            # Fall back to plain text so broken files can still be found
+            info["docs"].append(source)
+            return info
+
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            if node.name.startswith("_"):
+                continue
+            args = [arg.arg for arg in node.args.args if arg.arg not in ("self", "ctx")]
+            returns = ast.unparse(node.returns) if node.returns else ""
+            if node.name != "run":
+                info["names"].append(node.name)
+            info["signatures"].append(f"{node.name}({', '.join(args)}) {returns}".strip())
+        elif isinstance(node, ast.ClassDef):
+            info["names"].append(node.name)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            # Both `description: str = "..."` and `self.description = "..."`
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                name = target.attr if isinstance(target, ast.Attribute) else getattr(target, "id", None)
+                if (
+                    name == "description"
+                    and isinstance(node.value, ast.Constant)
+                    and isinstance(node.value.value, str)
+                ):
+                    info["descriptions"].append(node.value.value)
+            continue
+        else:
+            continue
+        docstring = ast.get_docstring(node)
+        if docstring:
+            info["docs"].append(docstring)
+    return info
+
+
+def _summary(texts: List[str]) -> str:
+    for text in texts:
+        if text.strip():
+            return text.strip().splitlines()[0]
+    return ""
+
+
+class ToolIndex:
+    """
+    A TF-IDF index of tool files, persisted as JSON.
+
+    Entries are keyed by file path and re-extracted only when the file's
+    modification time changes.
+    """
+
+    def __init__(self, path: str = INDEX_FILE):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+
+    @classmethod
+    def load(cls, path: str = INDEX_FILE) -> "ToolIndex":
+        index = cls(path)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                index.entries = data.get("entries", {})
+        return index
+
+    def save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "entries": self.entries}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def add(self, file_path: str, save: bool = True) -> Optional[dict]:
+        """
+        Indexes (or re-indexes) a single tool file.
+
+        Args:
+            file_path (str): Path to the Python file of the tool.
+            save (bool): Write the index to disk afterwards.
+
+        Returns:
+            dict: The stored entry, or None if the file has nothing to index.
+        """
+        key = os.path.normpath(file_path)
+        with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            info = _describe_source(f.read())
+
+        terms = Counter()
+        for name in info["names"]:
+            for term in tokenize(name):
+                terms[term] += NAME_WEIGHT
+        for text in info["signatures"] + info["descriptions"] + info["docs"]:
+            terms.update(tokenize(text))
+
+        if not terms:
+            self.entries.pop(key, None)
+            entry = None
+        else:
+            entry = {
+                "mtime": os.path.getmtime(file_path),
+                "names": info["names"],
+                "signatures": info["signatures"],
+                "summary": _summary(info["descriptions"] + info["docs"]),
+                "terms": dict(terms),
+            }
+            self.entries[key] = entry
+        if save:
+            self.save()
+        return entry
+
+    def remove(self, file_path: str, save: bool = True) -> None:
+        self.entries.pop(os.path.normpath(file_path), None)
+        if save:
+            self.save()
+
+    def update(self, paths: Iterable[str]) -> int:
+        """
+        Brings the index up to date with the given files and directories.
+
+        Only files that are new or modified since they were last indexed are
+        parsed again, and entries for deleted files are dropped.
+
+        Returns:
+            int: The number of entries that changed.
+        """
+        changed = 0
+        for file_path in _python_files(paths):
+            entry = self.entries.get(os.path.normpath(file_path))
+            if entry is None or entry["mtime"] != os.path.getmtime(file_path):
+                self.add(file_path, save=False)
+                changed += 1
+        for key in [key for key in self.entries if not os.path.exists(key)]:
+            del self.entries[key]
+            changed += 1
+        if changed:
+            self.save()
+        return changed
+
+    def _idf(self) -> Dict[str, float]:
+        document_frequency = Counter()
+        for entry in self.entries.values():
+            document_frequency.update(entry["terms"].keys())
+        total = len(self.entries)
+        return {term: math.log((1 + total) / (1 + count)) + 1 for term, count in document_frequency.items()}
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[float, str, dict]]:
+        """
+        Ranks indexed tools by similarity to a free-text request.
+
+        Returns:
+            List[Tuple[float, str, dict]]: (score, path, entry) tuples, best first.
+        """
+        query_terms = Counter(tokenize(query))
+        if not query_terms or not self.entries:
+            return []
+
+        idf = self._idf()
+        query_vector = {term: count * idf[term] for term, count in query_terms.items() if term in idf}
+        query_norm = math.sqrt(sum(weight * weight for weight in query_vector.values()))
+        if not query_norm:
+            return []
+
+        results = []
+        for key, entry in self.entries.items():
+            vector = {term: count * idf[term] for term, count in entry["terms"].items()}
+            norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+            dot = sum(weight * vector.get(term, 0.0) for term, weight in query_vector.items())
+            if dot:
+                results.append((dot / (norm * query_norm), key, entry))
+        results.sort(key=lambda result: result[0], reverse=True)
+        return results[:limit]
+
+    def best_match(
+        self, query: str, threshold: float = REUSE_THRESHOLD, params: Optional[Iterable[str]] = None
+    ) -> Optional[Tuple[float, str, dict]]:
+        """
+        Returns the closest existing tool if it is similar enough to offer.
+
+        The match is only a suggestion: similar wording does not mean the
+        same behaviour, so callers should confirm it before reusing it.
+
+        Args:
+            query (str): Free-text description of the wanted tool.
+            threshold (float): Minimum similarity.
+            params: If given, the tool must also have a function taking exactly these parameters.
+        """
+        wanted = None if params is None else {param.split(":")[0].strip() for param in params}
+        for score, path, entry in self.search(query):
+            if score < threshold:
+                break
+            if not os.path.exists(path):
+                continue
+            if wanted is not None and wanted not in [_signature_params(sig) for sig in entry["signatures"]]:
+                continue
+            return score, path, entry
+        return None
+
+
+def _signature_params(signature: str) -> set:
+    """The parameter names of an indexed signature such as "run(name, time_of_day) str"."""
+    inside = signature[signature.find("(") + 1:signature.find(")")]
+    return {param.strip() for param in inside.split(",") if param.strip()}
+
+
+def defines_tool_class(path: str) -> bool:
+    """True if the file parses and defines a class with a run method."""
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            tree = ast.parse(f.read())
+    except (OSError, SyntaxError):
+        return False
+    return any(
+        isinstance(node, ast.ClassDef)
+        and any(isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and item.name == "run" for item in node.body)
+        for node in ast.walk(tree)
+    )
+
+
+def _python_files(paths: Iterable[str]) -> List[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(".py") and name not in EXCLUDED_FILES:
+                    files.append(os.path.join(path, name))
+        elif path.endswith(".py") and os.path.exists(path):
+            files.append(path)
+    return files
+
+
+if __name__ == "__main__":
+    index = ToolIndex.load()
+    if sys.argv[1:2] == ["-q"]:
+        for score, path, entry in index.search(" ".join(sys.argv[2:])):
+            print(f"{score:.2f}  {path}  {entry['summary']}")
+    else:
+        changed = index.update(sys.argv[1:] or TOOL_DIRECTORIES)
+        print(f"Indexed {len(index.entries)} tools ({changed} updated) in {index.path}")
@@ -0,0 +1,278 @@
+"""
+Opt-in call metrics for generated tools.
+
+Wraps the run methods of tool classes (or plain tool functions) and records
+per tool: call counts, errors, a latency histogram and the size of inputs
+and outputs. Metrics are exported in the Prometheus text format, either to a
+local file or from a small HTTP endpoint.
+
+Nothing is recorded until metrics are enabled, either with enable() or by
+setting TOOL_METRICS_FILE (written periodically and at exit) or
+TOOL_METRICS_PORT (served at http://localhost:PORT/metrics) before the first
+call to instrument().
+
+Usage:
+    from tool_metrics import instrument
+    from greeter_tool import Greeter
+    instrument(Greeter)  # every Greeter().run(...) is now measured
+
+tool_server.load_tool() instruments the tools it loads when either
+variable is set, e.g. TOOL_METRICS_FILE=tools.prom python my_script.py.
+"""
+import atexit
+import functools
+import inspect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+EXPORT_INTERVAL = 15.0  # seconds between metrics file writes
+
+_enabled = False
+
+
+def value_size(value: Any) -> int:
+    """Approximate size of a value: its length for text and bytes, else of its repr."""
+    if value is None:
+        return 0
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    return len(repr(value))
+
+
+class _ToolStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self.input_bytes = 0
+        self.output_bytes = 0
+
+
+class MetricsRegistry:
+    """Thread-safe store of per-tool call metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tools: Dict[str, _ToolStats] = {}
+
+    def record(self, tool: str, seconds: float, ok: bool = True, input_bytes: int = 0, output_bytes: int = 0) -> None:
+        with self._lock:
+            stats = self._tools.get(tool)
+            if stats is None:
+                stats = self._tools[tool] = _ToolStats()
+            stats.calls += 1
+            if not ok:
+                stats.errors += 1
+            stats.latency_sum += seconds
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    stats.buckets[index] += 1
+                    break
+            stats.input_bytes += input_bytes
+            stats.output_bytes += output_bytes
+
+    def reset(self) -> None:
+        with self._lock:
+            self._tools.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the metrics of every tool as plain dictionaries."""
+        with self._lock:
+            return {
+                tool: {
+                    "calls": stats.calls,
+                    "errors": stats.errors,
+                    "error_rate": stats.errors / stats.calls if stats.calls else 0.0,
+                    "latency_sum": stats.latency_sum,
+                    "latency_buckets": dict(zip(LATENCY_BUCKETS, stats.buckets)),
+                    "input_bytes": stats.input_bytes,
+                    "output_bytes": stats.output_bytes,
+                }
+                for tool, stats in self._tools.items()
+            }
+
+    def to_prometheus(self) -> str:
+        """Renders the metrics in the Prometheus text exposition format."""
+        with self._lock:
+            tools = sorted((tool, stats) for tool, stats in self._tools.items())
+            lines: List[str] = []
+
+            def metric(name: str, kind: str, help_text: str, values: List[str]) -> None:
+                lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"] + values)
+
+            metric("tool_calls_total", "counter", "Calls to the tool's run method.",
+                   [f'tool_calls_total{{tool="{_label(tool)}"}} {stats.calls}' for tool, stats in tools])
+            metric("tool_errors_total", "counter", "Calls that raised an exception.",
+                   [f'tool_errors_total{{tool="{_label(tool)}"}} {stats.errors}' for tool, stats in tools])
+
+            histogram = []
+            for tool, stats in tools:
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                    cumulative += count
+                    histogram.append(f'tool_call_duration_seconds_bucket{{tool="{_label(tool)}",le="{bound}"}} {cumulative}')
+                histogram.append(f'tool_call_duration_seconds_bucket{{tool="{_label(tool)}",le="+Inf"}} {stats.calls}')
+                histogram.append(f'tool_call_duration_seconds_sum{{tool="{_label(tool)}"}} {stats.latency_sum:.6f}')
+                histogram.append(f'tool_call_duration_seconds_count{{tool="{_label(tool)}"}} {stats.calls}')
+            metric("tool_call_duration_seconds", "histogram", "Time spent in the tool's run method.", histogram)
+
+            metric("tool_input_bytes_total", "counter", "Approximate size of the arguments passed to the tool.",
+                   [f'tool_input_bytes_total{{tool="{_label(tool)}"}} {stats.input_bytes}' for tool, stats in tools])
+            metric("tool_output_bytes_total", "counter", "Approximate size of the values returned by the tool.",
+                   [f'tool_output_bytes_total{{tool="{_label(tool)}"}} {stats.output_bytes}' for tool, stats in tools])
+        return "\n".join(lines) + "\n"
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = MetricsRegistry()
+
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _measured(run: Callable, tool_name: Optional[str], is_method: bool) -> Callable:
+    # The instance and the portia ToolRunContext are not tool inputs
+    try:
+        params = list(inspect.signature(run).parameters)
+    except (TypeError, ValueError):
+        params = []
+    skipped = {params.index("ctx")} if "ctx" in params else set()
+    if is_method:
+        skipped.add(0)
+
+    @functools.wraps(run)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return run(*args, **kwargs)
+        if tool_name is not None:
+            name = tool_name
+        elif is_method and args:
+            name = getattr(args[0], "name", None) or type(args[0]).__name__
+        else:
+            name = run.__name__
+        input_bytes = sum(value_size(value) for index, value in enumerate(args) if index not in skipped) + sum(
+            value_size(value) for key, value in kwargs.items() if key != "ctx"
+        )
+        started = time.perf_counter()
+        try:
+            result = run(*args, **kwargs)
+        except Exception:
+            metrics.record(name, time.perf_counter() - started, False, input_bytes)
+            raise
+        metrics.record(name, time.perf_counter() - started, True, input_bytes, value_size(result))
+        return result
+
+    wrapper.__tool_metrics__ = True
+    return wrapper
+
+
+def instrument(target: Any, name: Optional[str] = None) -> Any:
+    """
+    Adds metrics to a tool's run method.
+
+    Args:
+        target: A tool class (its run method is replaced), a tool instance
+            (only that instance is wrapped) or a plain tool function (a
+            wrapped function is returned).
+        name (str): Name to report the tool under. Defaults to the tool's
+            name attribute, or the class or function name.
+
+    Returns:
+        The instrumented class, instance or function.
+    """
+    _start_from_env()
+    if inspect.isclass(target):
+        if not getattr(target.run, "__tool_metrics__", False):
+            target.run = _measured(target.run, name, is_method=True)
+        return target
+    if callable(getattr(target, "run", None)) and not inspect.isfunction(target):
+        if not getattr(target.run, "__tool_metrics__", False):
+            tool_name = name or getattr(target, "name", None) or type(target).__name__
+            # object.__setattr__ also works on pydantic models such as portia tools
+            object.__setattr__(target, "run", _measured(target.run, tool_name, is_method=False))
+        return target
+    if getattr(target, "__tool_metrics__", False):
+        return target
+    return _measured(target, name, is_method=False)
+
+
+def write_metrics_file(path: str) -> None:
+    """Writes the metrics to a file in the Prometheus text format, atomically."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(metrics.to_prometheus())
+    os.replace(tmp_path, path)
+
+
+def start_file_export(path: str, interval: float = EXPORT_INTERVAL) -> threading.Thread:
+    """Enables metrics and rewrites the metrics file every interval seconds and at exit."""
+    enable()
+
+    def export_loop():
+        while True:
+            time.sleep(interval)
+            write_metrics_file(path)
+
+    thread = threading.Thread(target=export_loop, daemon=True, name="tool-metrics-export")
+    thread.start()
+    atexit.register(write_metrics_file, path)
+    return thread
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.to_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Enables metrics and serves them at http://host:port/metrics from a background thread."""
+    enable()
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="tool-metrics-http").start()
+    return server
+
+
+_started_from_env = False
+
+
+def _start_from_env() -> None:
+    """Starts the exports configured in the environment, once."""
+    global _started_from_env
+    if _started_from_env:
+        return
+    _started_from_env = True
+    if os.getenv("TOOL_METRICS_FILE"):
+        start_file_export(os.environ["TOOL_METRICS_FILE"])
+    if os.getenv("TOOL_METRICS_PORT"):
+        serve_metrics(int(os.environ["TOOL_METRICS_PORT"]))
@@ -0,0 +1,529 @@
+"""
+Local execution service for generated tools.
+
+A pool of worker processes imports the generated tools once and keeps them
+loaded, so CPU-heavy tools run on several cores and each call is isolated
+from the caller. Calls arrive over a Unix socket as JSON lines:
+
+    {"id": 1, "tool": "email_extractor", "args": {"text": "..."}, "timeout": 5}
+
+and are answered with {"id": 1, "ok": true, "result": ...} or
+{"id": 1, "ok": false, "error": "..."}. A connection may send several
+calls without waiting; answers are written as calls finish, so they can
+arrive out of order and are matched by id.
+
+The socket is only accessible to the user running the server, and a
+server refuses to start on the socket of one that is still running.
+
+Calls for the same tool are batched to a worker (but spread over the idle
+workers first), each tool can have a concurrency limit, every call has a
+timeout counted from when it was submitted (a worker that runs over it is
+killed and replaced) and workers are recycled after a number of calls or
+when their memory grows past a threshold. With --metrics-file or
+--metrics-port, every call is recorded in tool_metrics.
+
+Usage:
+    python tool_server.py email_extractor="email extractor final.py" greeter=greeter_tool.py:Greeter \\
+        --workers 4 --limit greeter=1
+"""
+import argparse
+import errno
+import functools
+import importlib.util
+import inspect
+import json
+import math
+import multiprocessing
+import os
+import queue
+import re
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, wait
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import tool_metrics
+
+# Per user, so one user's server is never mistaken for another's
+DEFAULT_SOCKET = os.path.join(
+    os.getenv("XDG_RUNTIME_DIR") or tempfile.gettempdir(), f"toolsmith_tools_{os.getuid()}.sock"
+)
+DEFAULT_TIMEOUT = 30.0  # seconds per call
+DEFAULT_MAX_CALLS = 1000  # calls before a worker is replaced
+DEFAULT_MAX_MEMORY_MB = 512
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_BATCH_WINDOW = 0.002  # seconds to wait for more calls to the same tool
+
+
+def load_tool(spec: str, metrics: Optional[bool] = None) -> Callable[..., Any]:
+    """
+    Imports a generated tool and returns a function that runs it.
+
+    Args:
+        spec (str): "path/to/file.py:Name" or just "path/to/file.py". Without a
+            name, the function named after the file or the only class with a
+            run method is used. Classes are instantiated once and their run
+            method is called; a ctx parameter is passed as None.
+        metrics (bool): Record the tool's calls with tool_metrics.instrument().
+            By default only when TOOL_METRICS_FILE or TOOL_METRICS_PORT is set.
+
+    Returns:
+        Callable: Takes the tool's arguments as keywords.
+    """
+    path, _, attribute = spec.partition(":")
+    module_name = re.sub(r"\W", "_", os.path.splitext(os.path.basename(path))[0])
+    module_spec = importlib.util.spec_from_file_location(module_name, path)
+    if module_spec is None:
+        raise ImportError(f"Cannot load tool from {path}")
+    module = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(module)
+
+    if attribute:
+        target = getattr(module, attribute)
+    elif callable(getattr(module, module_name, None)):
+        target = getattr(module, module_name)
+    else:
+        classes = [
+            value for value in vars(module).values()
+            if inspect.isclass(value) and value.__module__ == module.__name__ and callable(getattr(value, "run", None))
+        ]
+        if len(classes) != 1:
+            raise ImportError(f"Cannot tell which tool to run in {path}; use {path}:Name")
+        target = classes[0]
+
+    if metrics is None:
+        metrics = bool(os.getenv("TOOL_METRICS_FILE") or os.getenv("TOOL_METRICS_PORT"))
+    if metrics:
+        target = tool_metrics.instrument(target)
+
+    run = target().run if inspect.isclass(target) else target
+    if "ctx" in inspect.signature(run).parameters:
+        return lambda **args: run(ctx=None, **args)
+    return run
+
+
+def _rss_mb() -> float:
+    """Current resident memory of this process in MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource
+        # Peak rather than current usage, in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _worker_main(conn, tool_specs: Dict[str, str]) -> None:
+    """Runs in each worker process: loads every tool once, then runs batches of calls."""
+    tools: Dict[str, Callable] = {}
+    load_errors: Dict[str, str] = {}
+    for name, spec in tool_specs.items():
+        try:
+            # Calls are measured by the pool, not in the workers
+            tools[name] = load_tool(spec, metrics=False)
+        except Exception as e:
+            load_errors[name] = f"Failed to load tool: {type(e).__name__}: {e}"
+
+    while True:
+        try:
+            batch = conn.recv()
+        except EOFError:
+            break
+        if batch is None:
+            break
+        for call_id, name, args in batch:
+            started = time.perf_counter()
+            try:
+                if name in load_errors:
+                    raise RuntimeError(load_errors[name])
+                result = (True, tools[name](**args))
+            except Exception as e:
+                result = (False, f"{type(e).__name__}: {e}")
+            duration = time.perf_counter() - started
+            try:
+                conn.send((call_id, *result, duration, _rss_mb()))
+            except Exception as e:
+                # The result could not be pickled
+                conn.send((call_id, False, f"Unsendable result: {e}", duration, _rss_mb()))
+
+
+class _Call:
+    def __init__(self, call_id: int, tool: str, args: Dict[str, Any], timeout: float):
+        self.id = call_id
+        self.tool = tool
+        self.args = args
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout
+        self.future: Future = Future()
+
+
+class _Worker:
+    """A worker process and the pipe used to talk to it."""
+
+    def __init__(self, context, tool_specs: Dict[str, str]):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, tool_specs), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.calls = 0
+        self.memory_mb = 0.0
+
+    def stop(self, kill: bool = False) -> None:
+        if not kill:
+            try:
+                self.conn.send(None)
+                self.process.join(timeout=1)
+            except (OSError, EOFError, BrokenPipeError):
+                pass
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    """
+    A pool of warm worker processes running generated tools.
+
+    Each worker is driven by a thread in this process that takes the next
+    batch of calls for one tool, sends it to its worker and waits for each
+    result until that call's deadline.
+    """
+
+    def __init__(
+        self,
+        tool_specs: Dict[str, str],
+        workers: Optional[int] = None,
+        tool_limits: Optional[Dict[str, int]] = None,
+        max_calls: int = DEFAULT_MAX_CALLS,
+        max_memory_mb: float = DEFAULT_MAX_MEMORY_MB,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        batch_window: float = DEFAULT_BATCH_WINDOW,
+        default_timeout: float = DEFAULT_TIMEOUT,
+    ):
+        self.tool_specs = dict(tool_specs)
+        self.tool_limits = dict(tool_limits or {})
+        self.max_calls = max_calls
+        self.max_memory_mb = max_memory_mb
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.default_timeout = default_timeout
+        self.workers = workers or os.cpu_count() or 1
+
+        # Spawned workers do not inherit this process's threads or sockets
+        self._context = multiprocessing.get_context("spawn")
+        self._pending: Dict[str, Deque[_Call]] = {name: deque() for name in self.tool_specs}
+        self._active: Dict[str, int] = {name: 0 for name in self.tool_specs}
+        self._condition = threading.Condition()
+        self._next_id = 0
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._drive_worker, daemon=True, name=f"tool-worker-{index}")
+            for index in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, tool: str, args: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Future:
+        """Queues a call and returns a Future with its result."""
+        if tool not in self.tool_specs:
+            raise KeyError(f"Unknown tool: {tool}")
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Worker pool is closed")
+            self._next_id += 1
+            call = _Call(self._next_id, tool, args or {}, timeout or self.default_timeout)
+            self._pending[tool].append(call)
+            self._condition.notify_all()
+        return call.future
+
+    def call(self, tool: str, args: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Any:
+        """Runs a tool and returns its result, raising if it failed or timed out."""
+        return self.submit(tool, args, timeout).result()
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def _next_batch(self) -> Optional[List[_Call]]:
+        """
+        Takes calls for the tool whose oldest call has waited longest.
+
+        The batch is at most batch_size calls and at most a fair share of the
+        waiting calls, so calls to one tool run in parallel on idle workers.
+        """
+        with self._condition:
+            while True:
+                ready = [
+                    name for name, calls in self._pending.items()
+                    if calls and self._active[name] < self.tool_limits.get(name, self.workers)
+                ]
+                if ready:
+                    break
+                if self._closed:
+                    return None
+                self._condition.wait()
+
+            tool = min(ready, key=lambda name: self._pending[name][0].id)
+            pending = self._pending[tool]
+            if len(pending) < self.batch_size and self.batch_window:
+                # Give calls that arrive together a chance to share the round trip
+                self._condition.wait(self.batch_window)
+            limit = self.tool_limits.get(tool, self.workers)
+            if self._active[tool] >= limit:
+                return []
+            idle = self.workers - sum(self._active.values())
+            share = max(1, min(idle, limit - self._active[tool]))
+            batch = [pending.popleft() for _ in range(min(self.batch_size, math.ceil(len(pending) / share)))]
+            if not batch:
+                return []
+            self._active[tool] += 1
+            return batch
+
+    def _drive_worker(self) -> None:
+        worker = _Worker(self._context, self.tool_specs)
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    break
+                if not batch:
+                    continue
+                try:
+                    if not worker.process.is_alive():
+                        worker.stop(kill=True)
+                        worker = _Worker(self._context, self.tool_specs)
+                    worker = self._run_batch(worker, batch)
+                except Exception as e:
+                    # e.g. arguments that cannot be pickled; fail the batch but keep driving a worker
+                    for call in batch:
+                        if not call.future.done():
+                            self._record_metrics(call, 0.0, False)
+                            call.future.set_exception(e)
+                    worker.stop(kill=True)
+                    worker = _Worker(self._context, self.tool_specs)
+                finally:
+                    with self._condition:
+                        self._active[batch[0].tool] -= 1
+                        self._condition.notify_all()
+
+                if worker.calls >= self.max_calls or worker.memory_mb >= self.max_memory_mb:
+                    worker.stop()
+                    worker = _Worker(self._context, self.tool_specs)
+        finally:
+            worker.stop()
+
+    def _run_batch(self, worker: _Worker, batch: List[_Call]) -> _Worker:
+        """
+        Runs a batch on a worker, replacing the worker if a call times out or it dies.
+
+        Calls whose deadline passed while they were queued fail without being sent.
+        """
+        now = time.monotonic()
+        for call in batch:
+            if call.deadline <= now:
+                self._record_metrics(call, call.timeout, False)
+                call.future.set_exception(TimeoutError(f"{call.tool} did not finish within {call.timeout}s"))
+        batch = [call for call in batch if not call.future.done()]
+        if not batch:
+            return worker
+        calls = {call.id: call for call in batch}
+        worker.conn.send([(call.id, call.tool, call.args) for call in batch])
+
+        for call in batch:
+            try:
+                if not worker.conn.poll(max(0.0, call.deadline - time.monotonic())):
+                    raise TimeoutError(f"{call.tool} did not finish within {call.timeout}s")
+                call_id, ok, result, duration, memory_mb = worker.conn.recv()
+            except (TimeoutError, EOFError, OSError) as e:
+                error = e if isinstance(e, TimeoutError) else RuntimeError(f"Worker for {call.tool} died")
+                self._record_metrics(call, call.timeout, False)
+                # The worker is stuck or gone; the calls it had not answered yet go back in the queue
+                worker.stop(kill=True)
+                call.future.set_exception(error)
+                calls.pop(call.id)
+                unanswered = [waiting for waiting in batch if waiting.id in calls]
+                with self._condition:
+                    self._pending[call.tool].extendleft(reversed(unanswered))
+                    self._condition.notify_all()
+                return _Worker(self._context, self.tool_specs)
+
+            worker.calls += 1
+            worker.memory_mb = memory_mb
+            finished = calls.pop(call_id)
+            self._record_metrics(finished, duration, ok, result if ok else None)
+            if ok:
+                finished.future.set_result(result)
+            else:
+                finished.future.set_exception(RuntimeError(result))
+        return worker
+
+    @staticmethod
+    def _record_metrics(call: _Call, duration: float, ok: bool, result: Any = None) -> None:
+        """Records a call in tool_metrics, measured inside the worker, if metrics are enabled."""
+        if tool_metrics.is_enabled():
+            input_bytes = sum(tool_metrics.value_size(value) for value in call.args.values())
+            tool_metrics.metrics.record(call.tool, duration, ok, input_bytes, tool_metrics.value_size(result))
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Answers JSON requests, one per line, on a connection.
+
+    Every request is submitted to the pool as soon as it is read, and a
+    writer thread sends each answer when its call finishes.
+    """
+
+    def handle(self) -> None:
+        answers: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        writer = threading.Thread(target=self._write_answers, args=(answers,), daemon=True)
+        writer.start()
+        submitted = []
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            request_id = None
+            try:
+                request = json.loads(line)
+                request_id = request.get("id")
+                future = self.server.pool.submit(request["tool"], request.get("args"), request.get("timeout"))
+            except Exception as e:
+                answers.put({"id": request_id, "ok": False, "error": str(e)})
+                continue
+            # Runs in the pool's thread, so it only queues the answer
+            future.add_done_callback(functools.partial(self._queue_answer, answers, request_id))
+            submitted.append(future)
+        wait(submitted)
+        answers.put(None)
+        writer.join()
+
+    @staticmethod
+    def _queue_answer(answers: queue.Queue, request_id: Any, future: Future) -> None:
+        error = future.exception()
+        if error is None:
+            answers.put({"id": request_id, "ok": True, "result": future.result()})
+        else:
+            answers.put({"id": request_id, "ok": False, "error": str(error)})
+
+    def _write_answers(self, answers: queue.Queue) -> None:
+        while True:
+            response = answers.get()
+            if response is None:
+                return
+            try:
+                self.wfile.write((json.dumps(response, default=str) + "\n").encode("utf-8"))
+                self.wfile.flush()
+            except OSError:
+                pass  # the client has gone away; keep draining so handle() can finish
+
+
+class ToolServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Serves a WorkerPool over a Unix socket.
+
+    Raises:
+        OSError: If another server is still answering on the socket.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, pool: WorkerPool, socket_path: str = DEFAULT_SOCKET):
+        if os.path.exists(socket_path):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.connect(socket_path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    os.unlink(socket_path)  # left behind by a server that is gone
+                else:
+                    raise OSError(errno.EADDRINUSE, f"A tool server is already running on {socket_path}")
+        self.pool = pool
+        super().__init__(socket_path, _RequestHandler)
+
+    def server_bind(self) -> None:
+        # Create the socket without access for other users; anyone who can connect can run the tools
+        old_umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.server_address, 0o600)
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def call_tool(tool: str, args: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None,
+              socket_path: str = DEFAULT_SOCKET) -> Any:
+    """
+    Calls a tool on a running tool server.
+
+    Raises:
+        RuntimeError: If the tool failed, timed out or is unknown.
+    """
+    request = {"id": 1, "tool": tool, "args": args or {}, "timeout": timeout}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        connection.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        with connection.makefile("r", encoding="utf-8") as reader:
+            response = json.loads(reader.readline())
+    if not response["ok"]:
+        raise RuntimeError(response["error"])
+    return response["result"]
+
+
+def _parse_pairs(values: List[str], what: str) -> List[Tuple[str, str]]:
+    pairs = []
+    for value in values:
+        name, separator, rest = value.partition("=")
+        if not separator:
+            raise SystemExit(f"Expected NAME=VALUE for {what}, got {value!r}")
+        pairs.append((name, rest))
+    return pairs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve generated tools from a pool of warm worker processes.")
+    parser.add_argument("tools", nargs="+", help="NAME=path/to/tool.py[:Name]")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--limit", action="append", default=[], help="NAME=N concurrent calls for one tool")
+    parser.add_argument("--max-calls", type=int, default=DEFAULT_MAX_CALLS)
+    parser.add_argument("--max-memory", type=float, default=DEFAULT_MAX_MEMORY_MB, help="MB per worker")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="default seconds per call")
+    parser.add_argument("--metrics-file", help="write call metrics to this file in the Prometheus text format")
+    parser.add_argument("--metrics-port", type=int, help="serve call metrics at http://localhost:PORT/metrics")
+    options = parser.parse_args()
+
+    if options.metrics_file:
+        tool_metrics.start_file_export(options.metrics_file)
+    if options.metrics_port:
+        tool_metrics.serve_metrics(options.metrics_port)
+
+    pool = WorkerPool(
+        dict(_parse_pairs(options.tools, "tools")),
+        workers=options.workers,
+        tool_limits={name: int(limit) for name, limit in _parse_pairs(options.limit, "--limit")},
+        max_calls=options.max_calls,
+        max_memory_mb=options.max_memory,
+        batch_size=options.batch_size,
+        default_timeout=options.timeout,
+    )
+    server = ToolServer(pool, options.socket)
+    print(f"Serving {', '.join(pool.tool_specs)} on {options.socket} with {pool.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.close()
@@ -19,16 +19,47 @@ portia = Portia(
 
 # --- Step 2: Ask User for Tool Description ---
 tool_name = input("Name of your tool:\n")
-tool_purpose = input("What should it do?\n")
-tool_inputs = input("What are the inputs? (e.g., 'text: str, count: int'):\n")
-tool_output = input("What is the expected output? (e.g., 'List[str]'):\n")
+
+# Every completed stage is checkpointed, so an interrupted run can pick up where it stopped
+from run_journal import RunJournal
+
+journal = RunJournal.for_session(tool_name)
+resumed = journal.resumable() and input(
+    f"Resume the interrupted session for {tool_name} (last completed stage: {journal.last_stage()})? (y/n): "
+).strip().lower() == "y"
+
+if resumed:
+    tool_purpose, tool_inputs, tool_output = journal.output("request")
+else:
+    journal.start(tool_name=tool_name)
+    tool_purpose = input("What should it do?\n")
+    tool_inputs = input("What are the inputs? (e.g., 'text: str, count: int'):\n")
+    tool_output = input("What is the expected output? (e.g., 'List[str]'):\n")
+    journal.record("request", tool_name, [tool_purpose, tool_inputs, tool_output])
+
+# --- Step 2b: Offer an existing tool before generating a new one ---
+from tool_index import ToolIndex, TOOL_DIRECTORIES
+
+tool_index = ToolIndex.load()
+tool_index.update(TOOL_DIRECTORIES)
+match = None if resumed else tool_index.best_match(f"{tool_name} {tool_purpose} {tool_inputs} {tool_output}")
+if match:
+    score, match_path, match_entry = match
+    print(f"\n♻️ An existing tool looks similar ({score:.0%} match): {match_path}")
+    print(f"   {match_entry['summary']}")
+    reuse = input("Reuse it instead of generating a new one? (y/n): ").strip().lower()
+    if reuse == "y":
+        print(f"✅ Reusing {os.path.abspath(match_path)}")
+        journal.finish(reused=match_path)
+        exit()
 
 # --- Step 3: Ask Portia to Generate a Plan ---
 
 
-def tool_prompt(original_code=None, feedback=None):
-    if feedback and original_code:
-        return f"""
+from prompt_budget import MIN_REVIEW_TOKENS, PromptTemplate, Section
+
+# Prompt templates are compiled once and trimmed to the model's token budget on render
+REVISION_TEMPLATE = PromptTemplate("""
 You previously created a Python function based on a user request.
 
 Here is the original function code:
@@ -40,12 +71,9 @@ Here is the feedback from a code reviewer:
 Please revise and improve the function accordingly. Keep the same structure, inputs, and purpose. Do not remove any existing logic unless it's incorrect. Only make improvements based on the review.
 
 Return only the improved Python function code. Do not include any explanation, description, or markdown syntax.
-"""
+""")
 
-
-    else:
-
-        return f"""
+GENERATION_TEMPLATE = PromptTemplate("""
 You are a coding assistant. Write a complete Python function called `{tool_name}`.
 
 📌 Purpose:
@@ -63,50 +91,86 @@ You are a coding assistant. Write a complete Python function called `{tool_name}
 - Return actual, working Python code (not a description or summary).
 - Output only the code. Do not explain anything or include text before/after the function.
 
-{"🔁 Revision feedback: " + feedback if feedback else ""}
-"""
+{revision}
+""")
+
+
+def tool_prompt(original_code=None, feedback=None):
+    if feedback is not None and original_code:
+        return REVISION_TEMPLATE.render(
+            original_code=Section(original_code, kind="code", priority=2, truncate=False),
+            feedback=Section(feedback, kind="review", priority=2, min_tokens=MIN_REVIEW_TOKENS),
+        )
+
+
+    else:
+
+        return GENERATION_TEMPLATE.render(
+            tool_name=tool_name,
+            tool_purpose=tool_purpose,
+            tool_inputs=tool_inputs,
+            tool_output=tool_output,
+            revision=Section("🔁 Revision feedback: " + feedback if feedback else "", kind="review"),
+        )
 
 # Step 1: Plan the task
-plan = portia.plan(tool_prompt())
+# Stages already in the journal are reused instead of calling the LLM again
+from portia.plan import Plan
+
+plan_prompt = tool_prompt()
+plan_data = journal.run_stage("plan", plan_prompt, lambda: portia.plan(plan_prompt).model_dump(mode="json"))
+plan = Plan.model_validate(plan_data)
 print("\n🧠 Generated Plan Steps:")
 for step in plan.steps:
     print(step.model_dump_json(indent=2))
 
 # Step 2: Run the plan
-print("\n🚀 Running the plan to generate code...")
-plan_run = portia.run_plan(plan)
+def run_generation():
+    print("\n🚀 Running the plan to generate code...")
+    plan_run = portia.run_plan(plan)
 
-# Step 3: Extract the result
+    # Step 3: Extract the result
 
-#print("\n--- RAW OUTPUTS ---")
-#print(type(plan_run.outputs))
-#print(dir(plan_run.outputs))  # See its methods/fields
-print("\n--- What is step_outputs? ---")
-print(type(plan_run.outputs))
-print(dir(plan_run.outputs))
+    #print("\n--- RAW OUTPUTS ---")
+    #print(type(plan_run.outputs))
+    #print(dir(plan_run.outputs))  # See its methods/fields
+    print("\n--- What is step_outputs? ---")
+    print(type(plan_run.outputs))
+    print(dir(plan_run.outputs))
 
-# Now try this more cautiously
-step_outputs = getattr(plan_run.outputs, "step_outputs", None)
+    # Now try this more cautiously
+    step_outputs = getattr(plan_run.outputs, "step_outputs", None)
 
-if step_outputs is None:
-    print("❌ step_outputs is missing!")
-else:
-    print(f"✅ step_outputs is a {type(step_outputs)}")
-    print("🔍 Contents:", step_outputs)
+    if step_outputs is None:
+        print("❌ step_outputs is missing!")
+    else:
+        print(f"✅ step_outputs is a {type(step_outputs)}")
+        print("🔍 Contents:", step_outputs)
+
+    # Grab the dictionary
+    step_outputs = plan_run.outputs.step_outputs
 
-# Grab the dictionary
-step_outputs = plan_run.outputs.step_outputs
+    # Grab the first key (we assume only one tool output for now)
+    output_key = list(step_outputs.keys())[0]
 
-# Grab the first key (we assume only one tool output for now)
-output_key = list(step_outputs.keys())[0]
+    # Get the actual code string
+    generated_code = step_outputs[output_key].value.strip()
 
-# Get the actual code string
-generated_code = step_outputs[output_key].value.strip()
+    print(f"\n🧩 Output Key: {output_key}")
+    return generated_code
 
-print(f"\n🧩 Output Key: {output_key}")
+generated_code = journal.run_stage("generate", plan_data, run_generation)
 print("\n🔧 Final Generated Code:\n")
 print(generated_code)
 
+# Fix known performance anti-patterns before saving and reviewing (no LLM call)
+from perf_lint import fix as fix_performance, format_findings
+
+generated_code, perf_findings = fix_performance(generated_code)
+if perf_findings:
+    print("\n⚡ Performance lint:\n")
+    print(format_findings(perf_findings))
+
 
 
 
@@ -115,6 +179,7 @@ filename = f"{tool_name}.py"
 with open(filename, "w") as f:
     f.write(generated_code)
 print(f"✅ Saved to {filename}")
+tool_index.add(filename)
 
 import os
 print(f"🔎 Absolute file path: {os.path.abspath(filename)}")
@@ -124,7 +189,9 @@ print(f"📂 File exists? {os.path.exists(filename)}")
 from review_tool import review_tool
 
 # Step 1: Run the review
-review = review_tool(generated_code)
+# Set PARALLEL_REVIEW=1 to review each dimension concurrently
+parallel_review = os.getenv("PARALLEL_REVIEW") == "1"
+review = journal.run_stage("review", generated_code, lambda: review_tool(generated_code, parallel=parallel_review))
 print("\n🧠 Review of Initial Tool:\n")
 print(review)
 
@@ -133,14 +200,24 @@ use_feedback = input("\nWould you like to improve the tool using this feedback?
 
 if use_feedback == "y":
     #improved_plan = portia.plan(tool_prompt(feedback=review))
-    improved_plan = portia.plan(tool_prompt(original_code=generated_code, feedback=review))
+    # Pass on the lint warnings that could not be fixed automatically
+    lint_warnings = [finding for finding in perf_findings if not finding.fixed]
+    if lint_warnings:
+        review += "\n\nPerformance lint warnings:\n" + format_findings(lint_warnings)
+    improve_prompt = tool_prompt(original_code=generated_code, feedback=review)
+    improved_plan_data = journal.run_stage(
+        "improve_plan", improve_prompt, lambda: portia.plan(improve_prompt).model_dump(mode="json")
+    )
+
+    def run_improvement():
+        improved_run = portia.run_plan(Plan.model_validate(improved_plan_data))
 
-    improved_run = portia.run_plan(improved_plan)
+        # Extract improved code
+        improved_outputs = improved_run.outputs.step_outputs
+        improved_key = list(improved_outputs.keys())[0]
+        return improved_outputs[improved_key].value.strip()
 
-    # Extract improved code
-    improved_outputs = improved_run.outputs.step_outputs
-    improved_key = list(improved_outputs.keys())[0]
-    improved_code = improved_outputs[improved_key].value.strip()
+    improved_code = journal.run_stage("improve", improved_plan_data, run_improvement)
 
     print("\n✨ Improved Tool Code:\n")
     print(improved_code)
@@ -155,6 +232,10 @@ if use_feedback == "y":
         .replace("```", "")
         .strip()
     )
+    cleaned_code, perf_findings = fix_performance(cleaned_code)
+    if perf_findings:
+        print("\n⚡ Performance lint:\n")
+        print(format_findings(perf_findings))
 
     with open(improved_filename, "w") as f:
         f.write(cleaned_code)
@@ -165,6 +246,7 @@ if use_feedback == "y":
 
 
 
+    tool_index.add(improved_filename)
     print(f"✅ Improved tool saved to {improved_filename}")
     print(f"🔎 Path: {os.path.abspath(improved_filename)}")
     print(f"📂 File exists? {os.path.exists(improved_filename)}")
@@ -172,4 +254,5 @@ if use_feedback == "y":
 else:
     print("✅ Keeping original version only.")
 
+journal.finish()
 exit()